@@ -0,0 +1,180 @@
+"""Time mccole commands on a synthetic book and compare with a stored baseline."""
+
+import argparse
+import json
+from pathlib import Path
+import platform
+import shlex
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import synth
+
+
+# Where timings are saved and compared by default
+DEFAULT_BASELINE = Path(__file__).parent / "baseline.json"
+
+# Commands to time: name, arguments, and whether to remove the output first
+COMMANDS = [
+    ("startup", ["--version"], False),
+    ("detab", ["detab", "--src", "{src}"], False),
+    ("build", ["build", "--src", "{src}", "--dst", "{dst}"], True),
+    (
+        "build --single-page",
+        ["build", "--src", "{src}", "--dst", "{dst}", "--single-page", "{all}"],
+        True,
+    ),
+    ("check", ["check", "--src", "{src}", "--dst", "{dst}"], False),
+    (
+        "describe",
+        [
+            "describe",
+            "--src",
+            "{src}",
+            "--bibliography",
+            "--glossary",
+            "--inc",
+            "--words",
+        ],
+        False,
+    ),
+]
+
+# Book sizes recorded with the timings
+SIZES = ["chapters", "listings", "keys", "figures", "tables", "index", "paragraphs"]
+
+
+def main():
+    """Main driver."""
+    options = parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        src = Path(options.book) if options.book else Path(tmp) / "book"
+        if not options.book:
+            synth.generate(_synth_options(options, src))
+        results = run_benchmarks(options, src)
+
+    if options.book:
+        book = {"path": str(Path(options.book).resolve())}
+    else:
+        book = {name: getattr(options, name) for name in SIZES}
+    current = {
+        "book": book,
+        "python": platform.python_version(),
+        "results": results,
+    }
+    baseline = _load_baseline(options.baseline)
+    regressions = compare(baseline, current, options.tolerance)
+    if options.save:
+        options.baseline.write_text(json.dumps(current, indent=2), encoding="utf-8")
+    if regressions and not options.save:
+        sys.exit(1)
+
+
+def compare(baseline, current, tolerance):
+    """Print current timings beside the baseline and return names that got slower."""
+    base = {}
+    if baseline is not None:
+        if baseline["book"] == current["book"]:
+            base = baseline["results"]
+        else:
+            print("baseline was measured on a different book size", file=sys.stderr)
+
+    regressions = []
+    rows = []
+    for name, seconds in current["results"].items():
+        if name in base:
+            ratio = seconds / base[name]
+            flag = "SLOWER" if ratio > 1 + tolerance else ""
+            if flag:
+                regressions.append(name)
+            rows.append(
+                (name, f"{base[name]:.3f}", f"{seconds:.3f}", f"{ratio:.2f}", flag)
+            )
+        else:
+            rows.append((name, "-", f"{seconds:.3f}", "-", ""))
+
+    headers = ("Command", "Baseline", "Current", "Ratio", "")
+    widths = [max(len(h), *(len(r[i]) for r in rows)) for i, h in enumerate(headers)]
+    fmt = "  ".join(
+        f"{{:{'<' if i in (0, 4) else '>'}{w}}}" for i, w in enumerate(widths)
+    )
+    print(fmt.format(*headers).rstrip())
+    print("  ".join("-" * w for w in widths[:-1]))
+    for row in rows:
+        print(fmt.format(*row).rstrip())
+    return regressions
+
+
+def parse_args(args=None):
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--baseline", type=Path, default=DEFAULT_BASELINE, help="baseline timings"
+    )
+    parser.add_argument(
+        "--book", default=None, help="time an existing book instead of a synthetic one"
+    )
+    parser.add_argument("--mccole", default="mccole", help="command used to run mccole")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each command")
+    parser.add_argument(
+        "--save", action="store_true", help="save these timings as the baseline"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="fractional slowdown reported as a regression",
+    )
+    defaults = synth.parse_args(["--dst", "."])
+    for name in SIZES:
+        parser.add_argument(
+            f"--{name}", type=int, default=getattr(defaults, name), help=f"book {name}"
+        )
+    return parser.parse_args(args)
+
+
+def run_benchmarks(options, src):
+    """Time each command on a book, returning the median seconds for each."""
+    dst = src / "docs"
+    values = {"src": str(src), "dst": str(dst), "all": str(dst / "all.html")}
+    results = {}
+    for name, args, clean in COMMANDS:
+        command = shlex.split(options.mccole) + [a.format(**values) for a in args]
+        times = []
+        for _ in range(options.repeat):
+            if clean and dst.exists():
+                shutil.rmtree(dst)
+            start = time.perf_counter()
+            proc = subprocess.run(command, capture_output=True, text=True)
+            elapsed = time.perf_counter() - start
+            if proc.returncode != 0:
+                last = proc.stderr.strip().splitlines()[-1:] or ["no message"]
+                print(f"'{name}' failed: {last[0]}", file=sys.stderr)
+                break
+            times.append(elapsed)
+        if times:
+            results[name] = statistics.median(times)
+    return results
+
+
+def _load_baseline(path):
+    """Load baseline timings if they have been saved."""
+    if not path.is_file():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _synth_options(options, dst):
+    """Make options for generating a book of the requested size."""
+    args = ["--dst", str(dst)]
+    for name in SIZES:
+        args.extend([f"--{name}", str(getattr(options, name))])
+    return synth.parse_args(args)
+
+
+if __name__ == "__main__":
+    main()
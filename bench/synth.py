@@ -0,0 +1,232 @@
+"""Generate a synthetic book of configurable size for benchmarking."""
+
+import argparse
+from argparse import Namespace
+from pathlib import Path
+import random
+import shutil
+
+from mccole.create import create
+
+
+# Words used to fill paragraphs
+WORDS = (
+    "the a of to and in that is for it as with was on be by this are or from "
+    "data code file page build lesson figure table term reference example test "
+    "value function module result output input network system program learner"
+).split()
+
+# Suffixes and comment markers for included listings
+LISTINGS = [(".py", "#"), (".js", "//"), (".sh", "#"), (".sql", "--")]
+
+# Words of filler text in each paragraph
+PARAGRAPH_WORDS = 80
+
+
+def main():
+    """Main driver."""
+    options = parse_args()
+    generate(options)
+
+
+def generate(options):
+    """Write a synthetic book to options.dst."""
+    rng = random.Random(options.seed)
+    dst = options.dst
+    if dst.exists():
+        shutil.rmtree(dst)
+    create(Namespace(dst=dst, force=True, only=None, verbose=0))
+
+    slugs = [f"ch{i:02d}" for i in range(options.chapters)]
+    (dst / "pyproject.toml").write_text(
+        '[project]\nname = "synth"\n\n[tool.mccole]\nskips = ["*~"]\n',
+        encoding="utf-8",
+    )
+    (dst / "README.md").write_text(_home_page(slugs), encoding="utf-8")
+    _write_extras(dst, options)
+    _write_definitions(dst / "glossary", "Glossary", "term", options.keys)
+    _write_definitions(dst / "bibliography", "Bibliography", "Key", options.keys)
+    # The generated index supplies its own heading, so the page has no title
+    (dst / "index").mkdir(exist_ok=True)
+    (dst / "index" / "index.md").write_text("", encoding="utf-8")
+    for i, slug in enumerate(slugs):
+        _write_chapter(dst / slug, i, slugs, options, rng)
+
+
+def parse_args(args=None):
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dst", type=Path, required=True, help="output directory")
+    parser.add_argument("--chapters", type=int, default=20, help="number of chapters")
+    parser.add_argument(
+        "--listings", type=int, default=5, help="[%%inc%%] listings per chapter"
+    )
+    parser.add_argument(
+        "--keys", type=int, default=100, help="glossary and bibliography keys"
+    )
+    parser.add_argument("--figures", type=int, default=3, help="figures per chapter")
+    parser.add_argument("--tables", type=int, default=3, help="tables per chapter")
+    parser.add_argument(
+        "--index", type=int, default=10, help="index entries per chapter"
+    )
+    parser.add_argument(
+        "--paragraphs", type=int, default=20, help="paragraphs of text per chapter"
+    )
+    parser.add_argument("--seed", type=int, default=12345, help="random seed")
+    return parser.parse_args(args)
+
+
+def _filler(rng, refs):
+    """Make a paragraph of random words with references scattered through it."""
+    words = [rng.choice(WORDS) for _ in range(PARAGRAPH_WORDS)]
+    for ref in refs:
+        words.insert(rng.randrange(len(words) + 1), ref)
+    text = " ".join(words)
+    return text[:1].upper() + text[1:] + "."
+
+
+def _home_page(slugs):
+    """Make the home page listing all chapters and appendices."""
+    lessons = "\n".join(f"1.  [Chapter {slug}](@/{slug}/)" for slug in slugs)
+    slides = "\n".join(f"1.  [Chapter {slug}](@/{slug}/slides.html)" for slug in slugs)
+    return f"""# Synthetic Book
+
+[Project repository][repo]
+
+## Lessons
+
+<div id="lessons" markdown="1">
+
+{lessons}
+
+</div>
+
+## Slides
+
+<div id="slides" markdown="1">
+
+{slides}
+
+</div>
+
+## Appendices
+
+<div id="appendices" markdown="1">
+
+1.  [License](@/license/)
+1.  [Code of Conduct](@/conduct/)
+1.  [Bibliography](@/bibliography/)
+1.  [Glossary](@/glossary/)
+1.  [Index](@/index/)
+
+</div>
+
+[repo]: https://github.com/example/synth
+"""
+
+
+def _listing(suffix, comment, i, j):
+    """Make a source file with a marked region, an omitted region, and a tab."""
+    lines = [f"{comment} listing {j} of chapter {i}"]
+    for k in range(10):
+        lines.append(f"value_{k} = {k}  {comment} [scrub]")
+    lines.append(f"{comment} mccole: main")
+    lines.extend(f"\tresult = value_{k} * {j}" for k in range(5))
+    lines.append(f"{comment} mccole: /main")
+    lines.append(f"{comment} mccole: skip")
+    lines.extend(f"hidden_{k} = {k}" for k in range(3))
+    lines.append(f"{comment} mccole: /skip")
+    return "\n".join(lines) + "\n"
+
+
+def _write_chapter(chapter_dir, i, slugs, options, rng):
+    """Write one chapter with its listings, figures, tables, and slides."""
+    chapter_dir.mkdir()
+    parts = [
+        f"---\nsyllabus:\n-   Learn topic {i}\n---\n# Chapter {slugs[i]}\n",
+        '<p id="terms"></p>\n',
+    ]
+
+    refs = []
+    for k in range(options.index):
+        refs.append(f'[%i "topic-{i}-{k}" "topic {i} {k}" %]')
+    # Each key is defined and cited in exactly one chapter
+    for key in range(i, options.keys, len(slugs)):
+        refs.append(f'[%g term{key:04d} "term {key}" %]')
+        refs.append(f"[%b Key{key:04d} %]")
+    refs.append(f"[%x {slugs[(i + 1) % len(slugs)]} %]")
+    refs.append(f"[link{i % 50}][link{i % 50}]")
+    paragraphs = [[] for _ in range(max(1, options.paragraphs))]
+    for ref in refs:
+        paragraphs[rng.randrange(len(paragraphs))].append(ref)
+    parts.extend(_filler(rng, p) + "\n" for p in paragraphs)
+    parts.append("Thanks to [%thanks%].\n")
+
+    for j in range(options.listings):
+        suffix, comment = LISTINGS[j % len(LISTINGS)]
+        name = f"listing_{j:02d}{suffix}"
+        (chapter_dir / name).write_text(_listing(suffix, comment, i, j), "utf-8")
+        parts.append(f"[%inc {name} %]\n")
+        parts.append(f"[%inc {name} mark=main %]\n")
+        parts.append(f'[%inc {name} omit=skip scrub="\\s*{comment} \\[scrub\\]" %]\n')
+        parts.append(f"This listing has [%linecount {name} %] lines.\n")
+
+    for j in range(options.figures):
+        (chapter_dir / f"fig{j}.svg").write_text(
+            f'<svg xmlns="http://www.w3.org/2000/svg"><text>{i}.{j}</text></svg>\n',
+            encoding="utf-8",
+        )
+        parts.append(
+            f'[%figure slug=fig-{i}-{j} img=fig{j}.svg alt="Figure {j}" '
+            f'caption="Figure {j} of chapter {i}." %]\n'
+        )
+        parts.append(f"As [%f fig-{i}-{j} %] shows, {_filler(rng, [])}\n")
+
+    for j in range(options.tables):
+        rows = "".join(f"| {k} | {k * k} |\n" for k in range(10))
+        (chapter_dir / f"table{j}.md").write_text(
+            f"| n | n squared |\n|---|---|\n{rows}", encoding="utf-8"
+        )
+        parts.append(
+            f'[%table slug=tab-{i}-{j} tbl=table{j}.md caption="Table {j}." %]\n'
+        )
+        parts.append(f"See [%t tab-{i}-{j} %].\n")
+
+    parts.append(
+        '<section class="exercises" markdown="1">\n## Exercises\n\n'
+        + "".join(f"### Exercise {k}\n\n{_filler(rng, [])}\n\n" for k in range(3))
+        + "</section>\n"
+    )
+    (chapter_dir / "index.md").write_text("\n".join(parts), encoding="utf-8")
+    (chapter_dir / "slides.md").write_text(
+        f"---\ntitle: Chapter {slugs[i]}\n---\n<section>\n# Chapter {slugs[i]}\n</section>\n",
+        encoding="utf-8",
+    )
+
+
+def _write_definitions(dirpath, title, prefix, count):
+    """Write a glossary or bibliography whose entries' text matches their keys."""
+    dirpath.mkdir(exist_ok=True)
+    entries = "".join(
+        f'<span id="{prefix}{k:04d}">{prefix}{k:04d}</span>\n:   Definition {k}.\n\n'
+        for k in range(count)
+    )
+    (dirpath / "index.md").write_text(f"# {title}\n\n{entries}", encoding="utf-8")
+
+
+def _write_extras(dst, options):
+    """Write the links and acknowledgments files."""
+    extras = dst / "_extras"
+    extras.mkdir(exist_ok=True)
+    (extras / "links.md").write_text(
+        "".join(f"[link{k}]: https://example.com/{k}\n" for k in range(50)),
+        encoding="utf-8",
+    )
+    (extras / "thanks.yml").write_text(
+        "".join(f"- personal: Person\n  family: Number{k}\n" for k in range(20)),
+        encoding="utf-8",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -8,8 +8,6 @@ import urllib.parse
 import urllib.request
 from pathlib import Path
 
-from bs4 import BeautifulSoup
-from markdown import markdown
 
 from . import util
 
@@ -40,8 +38,8 @@ def bib(options):
 def _parse_bibliography(bib_path):
     """Convert bibliography Markdown to HTML and extract (key, [href, ...]) pairs."""
     md_text = bib_path.read_text(encoding="utf-8")
-    html = markdown(md_text, extensions=util.MARKDOWN_EXTENSIONS)
-    doc = BeautifulSoup(html, "html.parser")
+    html = util.markdown_to_html(md_text)
+    doc = util.make_soup(html)
 
     entries = []
     for dt in doc.find_all("dt"):
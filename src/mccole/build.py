@@ -1,69 +1,255 @@
 """Build site."""
 
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+import os
 from pathlib import Path
+import shutil
 
-from bs4 import BeautifulSoup
 import frontmatter as fm
-from jinja2 import Environment, FileSystemLoader
-from markdown import markdown
-import re
+from jinja2 import (
+    Environment,
+    FileSystemBytecodeCache,
+    FileSystemLoader,
+    TemplateNotFound,
+)
 import sys
 import tomli
 
 from .inclusions import patch_inclusions
 from .shortcodes import process_shortcodes
 from .index_build import build_index_page
+from . import manifest
+from . import profiling
 from . import util
 
 
-GLOSSARY_PATH = Path("glossary") / "index.md"
 BIBLIOGRAPHY_PATH = Path("bibliography") / "index.md"
 INDEX_PATH = Path("index") / "index.md"
 TEMPLATE_DIR = "_templates"
+TEMPLATE_NAV = "nav.html"
 TEMPLATE_PAGE = "page.html"
 TEMPLATE_SLIDES = "slides.html"
 
+# Threads used to copy files that are not rendered
+COPY_WORKERS = 8
 
-def build(options):
-    """Build the site."""
+# Compiled templates, relative to the output directory
+TEMPLATE_CACHE_DIR = util.CACHE_DIR / "templates"
+
+# Template environments made so far: {(template_dir, cache_dir): environment}
+_ENVIRONMENTS = {}
+
+# Per-process state for pages built in a worker pool
+_WORKER = {}
+
+
+def build(options, output=None, previous=None):
+    """
+    Build the site.
+
+    If output is a dict, pages are stored in it keyed by output path
+    instead of being written to disk, and other files are recorded by
+    their source path instead of being copied. previous is then the
+    manifest of the build that filled output (if any): the manifest on
+    disk describes the last build to disk, not the pages in memory.
+    """
     config = _load_configuration(options)
+    config["output"] = output
+    config["timings"] = {} if options.profile else None
+    config["written"] = _empty_written()
     if options.extra:
         config["extra_html"] = Path(options.extra).read_text(encoding="utf-8")
-    env = Environment(loader=FileSystemLoader(config["templates"]))
+    env = _make_environment(config)
+    config["site_context"] = _make_site_context(config, env)
     section_slugs, others = _find_files(config)
 
-    ix_entries = []
+    if options.force or ((output is not None) and (previous is None)):
+        previous = manifest.empty_manifest()
+    elif output is None:
+        previous = manifest.load_manifest(config["dst"])
+    current = manifest.empty_manifest()
+    current["global"] = manifest.global_hash(config)
+    tracking = (previous, current)
+
+    # Build home page, all section pages EXCEPT the index page, and slides
+    jobs = _page_jobs(config, section_slugs)
+    _build_pages(config, env, tracking, jobs, options.jobs)
+
+    # Build other files
+    _build_others(config, others, options.force)
+
+    # Build index page last so all ix_entries from other pages are available
+    _build_index(config, env, tracking, section_slugs, jobs)
+
+    _save_manifest(config, current)
+    _report_written(config)
+    if options.profile:
+        report = profiling.make_report(config["timings"])
+        profiling.save_report(options.profile, report)
+        profiling.print_report(report)
+        config["timings"] = None
+    return config, env
+
+
+def rebuild(config, env, changed, num_jobs=1):
+    """Rebuild only the pages and files affected by a set of changed source files."""
+    previous = config["manifest"]
+    current = {**previous, "pages": dict(previous["pages"])}
+    tracking = (previous, current)
+    util.refresh_files(util.file_cache(config))
+    config["written"] = _empty_written()
+    section_slugs, others = _find_files(config)
+
+    changed_keys = {manifest.source_key(config, path) for path in changed}
+    jobs = _page_jobs(config, section_slugs)
+    affected = []
+    for job in jobs:
+        entry = previous["pages"].get(manifest.source_key(config, job["src_path"]))
+        if (entry is None) or (set(entry["deps"]) & changed_keys):
+            affected.append(job)
+    _build_pages(config, env, tracking, affected, num_jobs)
 
-    # Build home page
-    _build_page(config, env, None, config["src"] / config["home_page"], ix_entries)
+    _build_others(config, {p for p in others & set(changed) if p.exists()})
 
-    # Build all section pages EXCEPT the index page (build it last)
-    for slug in section_slugs:
-        if slug == "index":
+    _build_index(config, env, tracking, section_slugs, jobs)
+
+    _save_manifest(config, current)
+    _report_written(config)
+    return [job["src_path"] for job in affected]
+
+
+def _page_job(slug, src_path, template_name=TEMPLATE_PAGE, indexed=True):
+    """Describe one page to be built."""
+    return {
+        "slug": slug,
+        "src_path": src_path,
+        "template_name": template_name,
+        "indexed": indexed,
+    }
+
+
+def _page_jobs(config, section_slugs):
+    """List the pages to build, in order, excluding the index page."""
+    jobs = [_page_job(None, config["src"] / config["home_page"])]
+
+    # Follow book order so that the index lists entries the same way every build
+    for slug, entry in config["order"].items():
+        if (slug == "index") or (slug not in section_slugs):
             continue
-        _build_page(config, env, slug, config["order"][slug]["filepath"], ix_entries)
+        jobs.append(_page_job(slug, entry["filepath"]))
 
-    # Build slides pages
     for entry in config.get("slides", []):
         src_file = entry["src_file"]
         if src_file.exists():
-            _build_page(config, env, None, src_file, template_name=TEMPLATE_SLIDES)
+            jobs.append(_page_job(None, src_file, TEMPLATE_SLIDES, indexed=False))
         else:
             util.warn(f"slides source not found: {src_file}")
 
-    # Build other files
-    for filepath in others:
-        _build_other(config, filepath)
+    return jobs
+
+
+def _build_pages(config, env, tracking, jobs, num_jobs=1):
+    """Build pages whose inputs have changed, recording them in the manifest."""
+    previous, current = tracking
+    stale = []
+    for job in jobs:
+        key = manifest.source_key(config, job["src_path"])
+        current["pages"][key] = manifest.page_entry(config, job["src_path"])
+        dst_path = _make_output_path(config, job["src_path"], suffix=".html")
+        if manifest.is_unchanged(
+            previous, current, key, _output_exists(config, dst_path)
+        ):
+            current["pages"][key]["ix_entries"] = previous["pages"][key]["ix_entries"]
+        else:
+            stale.append(job)
+
+    if (num_jobs > 1) and (len(stale) > 1):
+        # Workers get their own output map and send back what they render.
+        in_memory = config.get("output") is not None
+        worker_config = {**config, "output": {} if in_memory else None}
+        with ProcessPoolExecutor(
+            max_workers=num_jobs, initializer=_init_worker, initargs=(worker_config,)
+        ) as pool:
+            results = []
+            for page_ix, output, timings, written in pool.map(
+                _build_page_in_worker, stale
+            ):
+                if in_memory:
+                    for dst_path, text in output.items():
+                        _write_page(config, dst_path, text)
+                else:
+                    known = config.setdefault("written", _empty_written())
+                    for key, paths in written.items():
+                        known[key].extend(paths)
+                if timings is not None:
+                    profiling.merge_timings(config["timings"], timings)
+                results.append(page_ix)
+    else:
+        results = [_build_page_job(config, env, job) for job in stale]
 
-    # Build index page last so all ix_entries from other pages are available
-    if "index" in section_slugs and ix_entries:
-        _build_index_page(config, env, ix_entries)
-    elif "index" in section_slugs:
-        _build_page(
-            config, env, "index", config["order"]["index"]["filepath"], ix_entries
-        )
+    for job, page_ix in zip(stale, results):
+        key = manifest.source_key(config, job["src_path"])
+        current["pages"][key]["ix_entries"] = page_ix
 
-    return config, env
+
+def _build_index(config, env, tracking, section_slugs, jobs):
+    """Build the index page from the entries recorded for all other pages."""
+    if "index" not in section_slugs:
+        return
+    _, current = tracking
+    ix_entries = []
+    for job in jobs:
+        if job["indexed"]:
+            key = manifest.source_key(config, job["src_path"])
+            ix_entries.extend(current["pages"][key]["ix_entries"])
+
+    if ix_entries:
+        _build_index_page_if_changed(config, env, tracking, ix_entries)
+    else:
+        job = _page_job("index", config["order"]["index"]["filepath"])
+        _build_pages(config, env, tracking, [job])
+
+
+def _build_page_job(config, env, job):
+    """Build one page and return the index entries it defines."""
+    page_ix = []
+    _build_page(
+        config, env, job["slug"], job["src_path"], page_ix, job["template_name"]
+    )
+    return page_ix
+
+
+def _init_worker(config):
+    """Set up configuration and templates once per worker process."""
+    _WORKER["config"] = config
+    _WORKER["env"] = _make_environment(config)
+
+
+def _build_page_in_worker(job):
+    """Build one page in a worker process and send its results back."""
+    config = _WORKER["config"]
+    if config["output"] is not None:
+        config["output"] = {}
+    if config.get("timings") is not None:
+        config["timings"] = {}
+    config["written"] = _empty_written()
+    page_ix = _build_page_job(config, _WORKER["env"], job)
+    return page_ix, config["output"], config.get("timings"), config["written"]
+
+
+def _build_index_page_if_changed(config, env, tracking, ix_entries):
+    """Build the index page unless its source and entries are unchanged."""
+    previous, current = tracking
+    src_path = config["order"]["index"]["filepath"]
+    key = manifest.source_key(config, src_path)
+    current["pages"][key] = manifest.index_entry(config, src_path, ix_entries)
+    dst_path = _make_output_path(config, src_path, suffix=".html")
+
+    if not manifest.is_unchanged(
+        previous, current, key, _output_exists(config, dst_path)
+    ):
+        _build_index_page(config, env, ix_entries)
 
 
 def _build_page(
@@ -73,19 +259,22 @@ def _build_page(
     if ix_entries is None:
         ix_entries = []
 
-    content = src_path.read_text(encoding="utf-8")
+    with profiling.stage(config, src_path, "read"):
+        content = src_path.read_text(encoding="utf-8")
 
     # Parse frontmatter
-    post = fm.loads(content)
-    metadata = {k: v for k, v in post.metadata.items() if k != "version"}
-    body = post.content
+    with profiling.stage(config, src_path, "frontmatter"):
+        post = fm.loads(content)
+        metadata = {k: v for k, v in post.metadata.items() if k != "version"}
+        body = post.content
 
     # Process shortcodes BEFORE markdown conversion
-    body_with_links = f"{body}\n\n{config['links']}"
-    processed = process_shortcodes(body_with_links, config, src_path, ix_entries)
+    with profiling.stage(config, src_path, "shortcodes"):
+        processed = process_shortcodes(body, config, src_path, ix_entries)
 
     # Convert processed text to HTML
-    raw_html = markdown(processed, extensions=util.MARKDOWN_EXTENSIONS)
+    with profiling.stage(config, src_path, "markdown"):
+        raw_html = util.markdown_to_html(processed, config.get("references"))
 
     dst_path = _make_output_path(config, src_path, suffix=".html")
     _render_page(
@@ -108,25 +297,40 @@ def _build_index_page(config, env, ix_entries):
     else:
         metadata = {"title": "Index"}
 
-    raw_html = markdown(index_content, extensions=util.MARKDOWN_EXTENSIONS)
+    with profiling.stage(config, src_path, "markdown"):
+        raw_html = util.markdown_to_html(index_content)
     dst_path = _make_output_path(config, src_path, suffix=".html")
     _render_page(
         config, env, slug, src_path, dst_path, raw_html, metadata, TEMPLATE_PAGE
     )
 
 
-def _build_other(config, src_path):
+def _build_other(config, src_path, force=False):
     """Handle non-Markdown file."""
     dst_path = _make_output_path(config, src_path)
-    dst_path.write_bytes(src_path.read_bytes())
+    if config.get("output") is not None:
+        config["output"][dst_path] = src_path
+    else:
+        _copy_file(src_path, dst_path, config.get("link_files", False), force)
+
+
+def _build_others(config, filepaths, force=False):
+    """Handle non-Markdown files, copying several at a time."""
+    filepaths = sorted(filepaths)
+    if (config.get("output") is not None) or (len(filepaths) < 2):
+        for filepath in filepaths:
+            _build_other(config, filepath, force)
+        return
+    with ThreadPoolExecutor(max_workers=COPY_WORKERS) as pool:
+        list(pool.map(partial(_build_other, config, force=force), filepaths))
 
 
 def _collect_element_numbers(
-    dst_path, doc, selector, prefix, kind, get_caption_node, labeler
+    dst_path, doc, nodes, selector, prefix, kind, get_caption_node, labeler
 ):
     """Number figure-like elements and return IDs."""
     known = {}
-    for num, node in enumerate(doc.select(selector), start=1):
+    for num, node in enumerate(util.select_nodes(doc, nodes, selector), start=1):
         if "id" not in node.attrs:
             util.warn(f"{kind} {num} in {dst_path} has no ID")
             continue
@@ -147,7 +351,7 @@ def _collect_element_numbers(
     return known
 
 
-def _collect_figure_numbers(dst_path, doc):
+def _collect_figure_numbers(dst_path, doc, nodes=None):
     """Number figures and return IDs."""
 
     def get_caption_node(doc, node, num, dst_path):
@@ -163,11 +367,11 @@ def _collect_figure_numbers(dst_path, doc):
         caption.insert(0, f"Figure {num}: ")
 
     return _collect_element_numbers(
-        dst_path, doc, "figure", "f:", "figure", get_caption_node, labeler
+        dst_path, doc, nodes, "figure", "f:", "figure", get_caption_node, labeler
     )
 
 
-def _collect_table_numbers(dst_path, doc):
+def _collect_table_numbers(dst_path, doc, nodes=None):
     """Number tables and return IDs."""
 
     def get_caption_node(doc, node, num, dst_path):
@@ -188,13 +392,56 @@ def _collect_table_numbers(dst_path, doc):
         table.insert(0, caption)
 
     return _collect_element_numbers(
-        dst_path, doc, "div[id^='t:']", "t:", "table", get_caption_node, labeler
+        dst_path,
+        doc,
+        nodes,
+        "div[id^='t:']",
+        "t:",
+        "table",
+        get_caption_node,
+        labeler,
     )
 
 
-def _fill_element_numbers(dst_path, doc, prefix, known, text):
+def _copy_file(src_path, dst_path, link=False, force=False):
+    """Copy or hard-link a file unless the destination already matches it."""
+    src_stat = src_path.stat()
+    try:
+        dst_stat = dst_path.stat()
+    except FileNotFoundError:
+        dst_stat = None
+
+    if dst_stat is not None:
+        if os.path.samestat(src_stat, dst_stat):
+            return False
+        if (
+            (not force)
+            and (dst_stat.st_size == src_stat.st_size)
+            and (dst_stat.st_mtime_ns == src_stat.st_mtime_ns)
+        ):
+            return False
+
+    if link:
+        dst_path.unlink(missing_ok=True)
+        try:
+            os.link(src_path, dst_path)
+            return True
+        except OSError:
+            pass  # e.g., different file systems: fall back to copying
+
+    shutil.copyfile(src_path, dst_path)
+    os.utime(dst_path, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
+    return True
+
+
+def _empty_written():
+    """Make an empty record of pages written with changed or unchanged content."""
+    return {"changed": [], "unchanged": []}
+
+
+def _fill_element_numbers(dst_path, doc, prefix, known, text, nodes=None):
     """Fill in cross-reference numbers."""
-    for node in doc.select("a[href]"):
+    for node in util.select_nodes(doc, nodes, "a[href]"):
         if not node["href"].startswith(prefix):
             continue
 
@@ -255,18 +502,13 @@ def _load_configuration(options):
     config_path = options.src / options.config
     config = tomli.loads(config_path.read_text(encoding="utf-8"))
 
-    links = util.load_links(options.src)
-    glossary = _load_glossary(options.src)
-
+    parser = util.html_parser(options.parser)
     home_page = options.root
-    order = util.load_order(options.src, home_page)
-    slides = util.load_slides(options.src)
-    for entry in slides:
-        entry["src_file"] = util.slides_src_file(options.src, entry["href"])
+    project = util.load_project(options.src, home_page)
 
     mccole_config = config.get("tool", {}).get("mccole", {})
-    book_repo = mccole_config.get("repo", _load_book_repo(options.src, home_page))
-    book_title = mccole_config.get("title", _load_book_title(options.src, home_page))
+    book_repo = mccole_config.get("repo", project["repo"])
+    book_title = mccole_config.get("title", project["title"])
     brand = mccole_config.get("brand", book_title)
 
     raw_skips = mccole_config.pop("skips", [])
@@ -285,14 +527,16 @@ def _load_configuration(options):
         "dst": options.dst,
         "extras": options.src / util.EXTRAS_DIR,
         "forma": options.forma,
-        "glossary": glossary,
+        "glossary": util.project_glossary(project, parser),
         "home_page": home_page,
-        "links": links,
+        "link_files": options.link,
         "math": options.math,
-        "order": order,
+        "order": project["order"],
+        "parser": parser,
+        "references": util.load_references(project["links"]),
         "skip_names": skip_names,
         "skip_patterns": skip_patterns,
-        "slides": slides,
+        "slides": project["slides"],
         "src": options.src,
         "templates": options.src / TEMPLATE_DIR,
         "verbose": options.verbose,
@@ -300,50 +544,65 @@ def _load_configuration(options):
     }
 
 
-def _load_book_repo(src_path, home_page):
-    """Extract the '[repo]' link from the home page."""
-    try:
-        md = (src_path / home_page).read_text(encoding="utf-8")
-        m = re.search(r"^\[repo\]:\s+(.+)$", md, re.MULTILINE)
-        return m.group(1).strip() if m else ""
-    except Exception:
-        return ""
+def _render_page(
+    config, env, slug, src_path, dst_path, raw_html, metadata, template_name
+):
+    """Render, patch, and write one page."""
+    with profiling.stage(config, src_path, "render"):
+        template = env.get_template(template_name)
+        context = _make_context(config, slug, metadata)
+        rendered_html = template.render(content=raw_html, **context)
+    # Patch the parsed page rather than Markdown's tree: shortcode output and
+    # highlighted code are raw HTML that Markdown only stores as placeholders.
+    with profiling.stage(config, src_path, "parse"):
+        doc = util.make_soup(rendered_html, config.get("parser", util.HTML_PARSER))
+    _apply_patchers(config, src_path, dst_path, doc, _page_patchers())
+
+    with profiling.stage(config, src_path, "serialize"):
+        text = str(doc)
+    with profiling.stage(config, src_path, "write"):
+        _write_page(config, dst_path, text)
+
+
+def _report_written(config):
+    """Say how many pages were written with new content if requested."""
+    if config["verbose"] > 0:
+        written = config["written"]
+        print(
+            f"{len(written['changed'])} pages changed, "
+            f"{len(written['unchanged'])} unchanged"
+        )
 
 
-def _load_book_title(src_path, home_page):
-    """Extract the H1 title from the home page as the book title."""
-    try:
-        md = (src_path / home_page).read_text(encoding="utf-8")
-        m = re.search(r"^#\s+(.+)$", md, re.MULTILINE)
-        return m.group(1).strip() if m else ""
-    except Exception:
-        return ""
+def _save_manifest(config, current):
+    """Remember what was built, on disk unless building into memory."""
+    config["manifest"] = current
+    if config.get("output") is None:
+        manifest.save_manifest(config["dst"], current)
 
 
-def _load_glossary(src_path):
-    """Load glossary keys and terms."""
-    md = (src_path / GLOSSARY_PATH).read_text(encoding="utf-8")
-    html = markdown(md, extensions=util.MARKDOWN_EXTENSIONS)
-    doc = BeautifulSoup(html, "html.parser")
-    return {node["id"]: node.decode_contents() for node in doc.select("span[id]")}
+def _write_page(config, dst_path, text):
+    """Write a rendered page to disk or store it in memory if it has changed."""
+    if config.get("output") is not None:
+        changed = config["output"].get(dst_path) != text
+        config["output"][dst_path] = text
+    else:
+        try:
+            changed = util.write_if_changed(dst_path, text)
+        except Exception as exc:
+            print(f"unable to write {dst_path} because {exc}")
+            sys.exit(1)
+    written = config.setdefault("written", _empty_written())
+    written["changed" if changed else "unchanged"].append(dst_path)
 
 
-def _render_page(
-    config, env, slug, src_path, dst_path, raw_html, metadata, template_name
-):
-    """Render, patch, and write one page."""
-    template = env.get_template(template_name)
-    context = _make_context(config, slug, metadata)
-    rendered_html = template.render(content=raw_html, **context)
-    doc = BeautifulSoup(rendered_html, "html.parser")
-    for func in _page_patchers():
-        func(config, src_path, dst_path, doc)
-
-    try:
-        dst_path.write_text(str(doc), encoding="utf-8")
-    except Exception as exc:
-        print(f"unable to write {dst_path} because {exc}")
-        sys.exit(1)
+def _apply_patchers(config, src_path, dst_path, doc, patchers):
+    """Walk the page once, then run each patcher on the nodes it needs."""
+    with profiling.stage(config, src_path, "collect"):
+        nodes = util.collect_nodes(doc)
+    for func in patchers:
+        with profiling.stage(config, src_path, func.__name__.lstrip("_")):
+            func(config, src_path, dst_path, doc, nodes)
 
 
 def _fragment_patchers():
@@ -389,18 +648,16 @@ def _build_page_fragment(config, env, slug, src_path, ix_entries=None):
     metadata = {k: v for k, v in post.metadata.items() if k != "version"}
     body = post.content
 
-    body_with_links = f"{body}\n\n{config['links']}"
-    processed = process_shortcodes(body_with_links, config, src_path, ix_entries)
-    raw_html = markdown(processed, extensions=util.MARKDOWN_EXTENSIONS)
+    processed = process_shortcodes(body, config, src_path, ix_entries)
+    raw_html = util.markdown_to_html(processed, config.get("references"))
 
     dst_path = _make_output_path(config, src_path, suffix=".html")
     template = env.get_template(TEMPLATE_PAGE)
     context = _make_context(config, slug, metadata)
     rendered_html = template.render(content=raw_html, **context)
-    doc = BeautifulSoup(rendered_html, "html.parser")
+    doc = util.make_soup(rendered_html, config.get("parser", util.HTML_PARSER))
 
-    for func in _fragment_patchers():
-        func(config, src_path, dst_path, doc)
+    _apply_patchers(config, src_path, dst_path, doc, _fragment_patchers())
 
     return metadata, dst_path, doc
 
@@ -410,22 +667,10 @@ def _make_context(config, slug, metadata=None):
     if metadata is None:
         metadata = {}
     order = config["order"]
-    # Use a local variable name to avoid shadowing the parameter 'slug'
-    context = {
-        "lessons": [
-            (s, entry["title"])
-            for s, entry in order.items()
-            if entry["kind"] == "lessons"
-        ],
-        "appendices": [
-            (s, entry["title"])
-            for s, entry in order.items()
-            if entry["kind"] == "appendices"
-        ],
-        "slides": [
-            (entry["href"], entry["title"]) for entry in config.get("slides", [])
-        ],
-    }
+    site = config.get("site_context") or _make_site_context(config)
+    context = {key: site[key] for key in ("lessons", "appendices", "slides")}
+    if site["nav"] is not None:
+        context["nav"] = _mark_active_nav(site["nav"], slug)
 
     if slug is None:
         prev_link = None
@@ -468,6 +713,25 @@ def _make_context(config, slug, metadata=None):
     return {"prev": (prev_link, prev_title), "next": (next_link, next_title), **context}
 
 
+def _make_environment(config):
+    """Make the Jinja environment for the site's templates, once per process."""
+    if config.get("output") is None:
+        cache_dir = config["dst"] / TEMPLATE_CACHE_DIR
+    else:
+        cache_dir = None
+    key = (config["templates"], cache_dir)
+    if key not in _ENVIRONMENTS:
+        bytecode_cache = None
+        if cache_dir is not None:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            bytecode_cache = FileSystemBytecodeCache(str(cache_dir))
+        _ENVIRONMENTS[key] = Environment(
+            loader=FileSystemLoader(config["templates"]),
+            bytecode_cache=bytecode_cache,
+        )
+    return _ENVIRONMENTS[key]
+
+
 def _make_output_path(config, src_path, suffix=None):
     """Generate output file path."""
     if src_path.name in util.STANDARD_FILES:
@@ -478,7 +742,8 @@ def _make_output_path(config, src_path, suffix=None):
         dst_path = config["dst"] / src_path.relative_to(config["src"])
     if suffix is not None:
         dst_path = dst_path.with_suffix(suffix)
-    dst_path.parent.mkdir(parents=True, exist_ok=True)
+    if config.get("output") is None:
+        dst_path.parent.mkdir(parents=True, exist_ok=True)
     return dst_path
 
 
@@ -490,38 +755,85 @@ def _make_root_prefix(config, path):
     return "./" if (depth == 0) else "../" * depth
 
 
-def _patch_bibliography_links(config, src_path, dst_path, doc):
+def _make_site_context(config, env=None):
+    """Make the parts of the rendering context that are the same for every page."""
+    order = config["order"]
+    site = {
+        "lessons": [
+            (s, entry["title"])
+            for s, entry in order.items()
+            if entry["kind"] == "lessons"
+        ],
+        "appendices": [
+            (s, entry["title"])
+            for s, entry in order.items()
+            if entry["kind"] == "appendices"
+        ],
+        "slides": [
+            (entry["href"], entry["title"]) for entry in config.get("slides", [])
+        ],
+        "nav": None,
+    }
+    # Render the navigation menus once; each page then only marks its own link.
+    # Sites whose templates predate nav.html render the menus in page.html.
+    if env is not None:
+        try:
+            template = env.get_template(TEMPLATE_NAV)
+        except TemplateNotFound:
+            return site
+        site["nav"] = template.render(current_slug=None, **site)
+    return site
+
+
+def _mark_active_nav(nav, slug):
+    """Mark the current page's link in pre-rendered navigation menus."""
+    if slug is None:
+        return nav
+    link = f'href="@/{slug}/"'
+    return nav.replace(f"{link}>", f'{link} class="active">')
+
+
+def _output_exists(config, dst_path):
+    """Has this output file already been produced?"""
+    if config.get("output") is not None:
+        return dst_path in config["output"]
+    return dst_path.exists()
+
+
+def _patch_bibliography_links(config, src_path, dst_path, doc, nodes=None):
     """Convert b: bibliography links."""
-    _patch_special_link(config, src_path, dst_path, doc, "b:", "bibliography", True)
+    _patch_special_link(
+        config, src_path, dst_path, doc, nodes, "b:", "bibliography", True
+    )
 
 
-def _patch_figure_numbers(config, src_path, dst_path, doc):
+def _patch_figure_numbers(config, src_path, dst_path, doc, nodes=None):
     """Insert figure numbers."""
-    known = _collect_figure_numbers(dst_path, doc)
-    _fill_element_numbers(dst_path, doc, "#f:", known, "Figure")
+    known = _collect_figure_numbers(dst_path, doc, nodes)
+    _fill_element_numbers(dst_path, doc, "#f:", known, "Figure", nodes)
 
 
-def _patch_glossary_links(config, src_path, dst_path, doc):
+def _patch_glossary_links(config, src_path, dst_path, doc, nodes=None):
     """Convert g: glossary links."""
-    _patch_special_link(config, src_path, dst_path, doc, "g:", "glossary", False)
+    _patch_special_link(config, src_path, dst_path, doc, nodes, "g:", "glossary", False)
 
 
-def _patch_markdown_attribute(config, src_path, dst_path, doc):
+def _patch_markdown_attribute(config, src_path, dst_path, doc, nodes=None):
     """Remove markdown='1' attribute."""
-    for node in doc.select("[markdown]"):
+    for node in util.select_nodes(doc, nodes, util.MARKDOWN_SELECTOR):
         del node["markdown"]
 
 
-def _patch_exercise_labels(config, src_path, dst_path, doc):
+def _patch_exercise_labels(config, src_path, dst_path, doc, nodes=None):
     """Add aria-label to exercise sections so screen reader landmark navigation works."""
-    for node in doc.select("section.exercises"):
+    for node in util.select_nodes(doc, nodes, "section.exercises"):
         if not node.get("aria-label"):
             node["aria-label"] = "Exercises"
 
 
-def _patch_pre_accessibility(config, src_path, dst_path, doc):
+def _patch_pre_accessibility(config, src_path, dst_path, doc, nodes=None):
     """Make scrollable <pre> blocks keyboard-focusable and label them with their language."""
-    for node in doc.select("pre"):
+    for node in util.select_nodes(doc, nodes, "pre"):
         node["tabindex"] = "0"
         # Extract language from class like "language-python" → "python"
         classes = node.get("class", [])
@@ -531,24 +843,24 @@ def _patch_pre_accessibility(config, src_path, dst_path, doc):
                 break
 
 
-def _patch_pre_code_classes(config, src_path, dst_path, doc):
+def _patch_pre_code_classes(config, src_path, dst_path, doc, nodes=None):
     """Add language classes to <pre> elements."""
-    for node in doc.select("pre>code"):
+    for node in util.select_nodes(doc, nodes, "pre>code"):
         cls = node.get("class", [])
         node.parent["class"] = node.parent.get("class", []) + cls
 
 
-def _patch_th_scope(config, src_path, dst_path, doc):
+def _patch_th_scope(config, src_path, dst_path, doc, nodes=None):
     """Add scope attributes to <th> elements for screen reader table navigation."""
-    for node in doc.select("thead th"):
+    for node in util.select_nodes(doc, nodes, "thead th"):
         if not node.get("scope"):
             node["scope"] = "col"
-    for node in doc.select("tbody th"):
+    for node in util.select_nodes(doc, nodes, "tbody th"):
         if not node.get("scope"):
             node["scope"] = "row"
 
 
-def _patch_root_links(config, src_path, dst_path, doc):
+def _patch_root_links(config, src_path, dst_path, doc, nodes=None):
     """Convert @ links to relative path to root."""
     prefix = _make_root_prefix(config, dst_path)
     targets = (
@@ -558,14 +870,16 @@ def _patch_root_links(config, src_path, dst_path, doc):
         ("script[src]", "src"),
     )
     for selector, attr in targets:
-        for node in doc.select(selector):
+        for node in util.select_nodes(doc, nodes, selector):
             if node[attr].startswith("@/"):
                 node[attr] = node[attr].replace("@/", prefix)
 
 
-def _patch_special_link(config, src_path, dst_path, doc, prefix, stem, change_text):
+def _patch_special_link(
+    config, src_path, dst_path, doc, nodes, prefix, stem, change_text
+):
     """Patch specially-prefixed links."""
-    for node in doc.select("a[href]"):
+    for node in util.select_nodes(doc, nodes, "a[href]"):
         if not node["href"].startswith(prefix):
             continue
         assert node["href"].count(":") == 1
@@ -575,15 +889,15 @@ def _patch_special_link(config, src_path, dst_path, doc, prefix, stem, change_te
         node["href"] = _make_root_prefix(config, dst_path) + f"{stem}/#{key}"
 
 
-def _patch_table_numbers(config, src_path, dst_path, doc):
+def _patch_table_numbers(config, src_path, dst_path, doc, nodes=None):
     """Insert figure numbers."""
-    known = _collect_table_numbers(dst_path, doc)
-    _fill_element_numbers(dst_path, doc, "#t:", known, "Table")
+    known = _collect_table_numbers(dst_path, doc, nodes)
+    _fill_element_numbers(dst_path, doc, "#t:", known, "Table", nodes)
 
 
-def _patch_terms_defined(config, src_path, dst_path, doc):
+def _patch_terms_defined(config, src_path, dst_path, doc, nodes=None):
     """Insert terms defined where requested."""
-    paragraphs = doc.select("p#terms")
+    paragraphs = util.select_nodes(doc, nodes, "p#terms")
     if not paragraphs:
         return
     if len(paragraphs) > 1:
@@ -592,7 +906,9 @@ def _patch_terms_defined(config, src_path, dst_path, doc):
     para = paragraphs[0]
 
     keys = {
-        node["href"] for node in doc.select("a[href]") if node["href"].startswith("g:")
+        node["href"]
+        for node in util.select_nodes(doc, nodes, "a[href]")
+        if node["href"].startswith("g:")
     }
     if not keys:
         para.decompose()
@@ -610,16 +926,19 @@ def _patch_terms_defined(config, src_path, dst_path, doc):
         if i > 0:
             para.append(", ")
         para.append(tag)
+        if nodes is not None:
+            nodes["a[href]"].append(tag)
 
 
-def _patch_title(config, src_path, dst_path, doc):
+def _patch_title(config, src_path, dst_path, doc, nodes=None):
     """Make sure the HTML title element is set."""
-    if doc.title is None:
+    titles = util.select_nodes(doc, nodes, "title")
+    if not titles:
         util.warn(f"{dst_path} does not have <title> element")
         return
-    h1 = doc.find("h1")
-    if h1:
-        doc.title.string = h1.get_text()
+    headings = util.select_nodes(doc, nodes, "h1")
+    if headings:
+        titles[0].string = headings[0].get_text()
     else:
         slides_files = {entry["src_file"] for entry in config.get("slides", [])}
         if src_path not in slides_files:
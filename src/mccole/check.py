@@ -1,14 +1,16 @@
 """Check site."""
 
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import redirect_stderr
+from functools import partial
+import io
 from pathlib import Path
 import re
 import sys
 
-from bs4 import BeautifulSoup
-from html5validator.validator import Validator
-
 from . import util
+from . import validator
 
 
 GLOBAL = "<global>"
@@ -16,6 +18,12 @@ RE_FIGURE_CAPTION = re.compile(r"^Figure\s+\d+:")
 RE_LESSON_CROSSREF = re.compile(r"@/([a-zA-Z0-9][a-zA-Z0-9_-]+)/")
 RE_TABLE_CAPTION = re.compile(r"^Table\s+\d+:")
 
+# Pages whose full contents the site-wide checks need
+DEFINITION_KINDS = ["bibliography", "glossary"]
+
+# Per-process state for pages checked in a worker pool
+_WORKER = {}
+
 
 def check(options):
     """Check the site."""
@@ -25,43 +33,67 @@ def check(options):
         _check_output_files(options, dst_dir)
 
     paths = list(dst_dir.glob("**/index.html"))
-    pages = {
-        fp: BeautifulSoup(fp.read_text(encoding="utf-8"), "html.parser") for fp in paths
-    }
+    parser = util.html_parser(options.parser)
+
+    # Only the definition pages are kept whole; every other page is parsed,
+    # checked, reduced to its messages and links, and then thrown away.
+    definitions = {Path(options.dst, kind, "index.html") for kind in DEFINITION_KINDS}
+    pages = {fp: _parse_page(fp, parser) for fp in paths if fp in definitions}
+    if options.jobs > 1:
+        results = _check_pages_in_workers(options, paths, parser, options.jobs)
+    else:
+        results = {
+            fp: _check_page(options, fp, pages[fp])
+            if fp in pages
+            else _check_page_file(options, fp, parser)
+            for fp in paths
+        }
+    links = _index_links(results)
 
     _check_tabs_in_markdown(options)
     _check_lesson_crossrefs(options)
 
-    _check_all_html(options, pages)
-    _check_glossary_redefinitions(pages)
+    _check_all_html(options, paths)
+    _check_glossary_redefinitions(links)
 
     _check_bibliography_alphabetical(options, pages)
     _check_bibliography_key_mismatch(options, pages)
     _check_bibliography_bare_isbns(options, pages)
     _check_glossary_alphabetical(options, pages)
-    for kind in ["bibliography", "glossary"]:
-        _check_cross_references(options, pages, kind)
-        _check_unused_crossref_definitions(options, pages, kind)
+    for kind in DEFINITION_KINDS:
+        _check_cross_references(options, pages, links, kind)
+        _check_unused_crossref_definitions(options, pages, links, kind)
 
-    for func in [
-        _check_empty_inclusions,
-        _check_figure_structure,
-        _check_single_h1,
-        _check_table_structure,
-        _check_unknown_links,
-    ]:
-        for path, doc in pages.items():
-            func(options, path, doc)
+    for func in _page_checks():
+        for result in results.values():
+            sys.stderr.write(result["messages"][func.__name__])
 
 
 DIV_IN_SUMMARY = 'Element "div" not allowed as child of element "summary"'
 
 
-def _check_all_html(options, pages):
-    """Validate generated HTML."""
+def _check_all_html(options, paths):
+    """Validate generated HTML by sending pages to a local validator server."""
     ignore = [DIV_IN_SUMMARY] if options.relaxed else []
-    validator = Validator(ignore=ignore)
-    validator.validate(list(pages.keys()))
+    port = options.validator_port
+    proc = None
+    if not validator.validator_running(port):
+        try:
+            proc = validator.start_validator(port)
+        except (OSError, RuntimeError) as exc:
+            util.warn(f"unable to validate HTML: {exc}")
+            return
+    try:
+        validate = partial(_validate_page, port, ignore)
+        with ThreadPoolExecutor(max_workers=max(1, options.jobs)) as pool:
+            for filepath, (lines, error) in zip(paths, pool.map(validate, paths)):
+                if error is not None:
+                    util.warn(f"{filepath}: unable to validate HTML: {error}")
+                for line in lines:
+                    print(line)
+    finally:
+        if proc is not None:
+            validator.stop_validator(proc)
 
 
 def _check_bibliography_alphabetical(options, pages):
@@ -84,21 +116,19 @@ def _check_glossary_alphabetical(options, pages):
         )
 
 
-def _check_cross_references(options, pages, kind):
+def _check_cross_references(options, pages, links, kind):
     """Check that all cross-references match entries."""
     known = set(_get_crossref_definitions(options, pages, kind))
-    prefix = f"/{kind}/#"
-    for path, doc in pages.items():
-        for node in doc.select("a[href]"):
-            if prefix not in node["href"]:
-                continue
-            key = node["href"].split("#")[-1]
-            _require(path, key in known, f"unknown {kind} key {key}")
+    for path, href, _ in links[kind]:
+        key = href.split("#")[-1]
+        _require(path, key in known, f"unknown {kind} key {key}")
 
 
-def _check_element_structure(filepath, doc, selector, kind, caption_selector, pattern):
+def _check_element_structure(
+    filepath, doc, selector, kind, caption_selector, pattern, nodes=None
+):
     """Check that figure-like elements have IDs and captions."""
-    for node in doc.select(selector):
+    for node in util.select_nodes(doc, nodes, selector):
         if not _require(filepath, "id" in node.attrs, f"{kind} missing 'id'"):
             continue
         captions = node.select(caption_selector)
@@ -112,9 +142,9 @@ def _check_element_structure(filepath, doc, selector, kind, caption_selector, pa
         )
 
 
-def _check_empty_inclusions(options, filepath, doc):
+def _check_empty_inclusions(options, filepath, doc, nodes=None):
     """Report %inc inclusions whose generated content is only whitespace."""
-    for node in doc.select("div[data-inc]"):
+    for node in util.select_nodes(doc, nodes, "div[data-inc]"):
         icon = node.find("span", class_="inc-path")
         inc_path = icon["title"] if icon else node.get("data-inc", "unknown")
         pre = node.find("pre")
@@ -139,23 +169,20 @@ def _check_lesson_crossrefs(options):
                 )
 
 
-def _check_figure_structure(options, filepath, doc):
+def _check_figure_structure(options, filepath, doc, nodes=None):
     """Check that all figures have IDs and captions."""
     _check_element_structure(
-        filepath, doc, "figure", "figure", "figcaption", RE_FIGURE_CAPTION
+        filepath, doc, "figure", "figure", "figcaption", RE_FIGURE_CAPTION, nodes
     )
 
 
-def _check_glossary_redefinitions(pages):
+def _check_glossary_redefinitions(links):
     """Check for glossary terms that are defined more than once."""
     seen = defaultdict(list)
-    for path, doc in pages.items():
-        for node in doc.select("a[href]"):
-            if ("/glossary/#" in node["href"]) and (
-                "term-defined" not in node.get("class", [])
-            ):
-                key = node["href"].split("#")[-1]
-                seen[key].append(path)
+    for path, href, classes in links["glossary"]:
+        if "term-defined" not in classes:
+            key = href.split("#")[-1]
+            seen[key].append(path)
     for key, values in seen.items():
         _require(
             GLOBAL,
@@ -164,20 +191,26 @@ def _check_glossary_redefinitions(pages):
         )
 
 
-def _check_single_h1(options, filepath, doc):
+def _check_single_h1(options, filepath, doc, nodes=None):
     """Check that all pages have a single H1."""
-    titles = doc.find_all("h1")
+    titles = util.select_nodes(doc, nodes, "h1")
     _require(filepath, len(titles) == 1, f" {filepath} has {len(titles)} H1 elements")
 
 
-def _check_table_structure(options, filepath, doc):
+def _check_table_structure(options, filepath, doc, nodes=None):
     """Check that all tables have proper structure and IDs."""
     _check_element_structure(
-        filepath, doc, "div[data-caption]", "table", "caption", RE_TABLE_CAPTION
+        filepath,
+        doc,
+        "div[data-caption]",
+        "table",
+        "caption",
+        RE_TABLE_CAPTION,
+        nodes,
     )
 
 
-def _check_unknown_links(options, filepath, doc):
+def _check_unknown_links(options, filepath, doc, nodes=None):
     """Look for unresolved Markdown links."""
     unwanted = {"code", "pre"}
     for text in doc.find_all(string=lambda s: s and "][" in s):
@@ -221,18 +254,13 @@ def _get_crossref_definitions(options, pages, kind):
     return [outer.find("span").attrs["id"] for outer in doc.find_all("dt")]
 
 
-def _get_crossref_usage(pages, kind):
+def _get_crossref_usage(links, kind):
     """Get the set of referenced keys for one cross-reference kind."""
     used = set()
-    prefix = f"/{kind}/#"
-    for doc in pages.values():
-        for node in doc.select("a[href]"):
-            href = node["href"]
-            if prefix not in href:
-                continue
-            if (kind == "glossary") and ("term-defined" in node.get("class", [])):
-                continue
-            used.add(href.split("#")[-1])
+    for _, href, classes in links[kind]:
+        if (kind == "glossary") and ("term-defined" in classes):
+            continue
+        used.add(href.split("#")[-1])
     return used
 
 
@@ -276,10 +304,10 @@ def _check_bibliography_bare_isbns(options, pages):
             )
 
 
-def _check_unused_crossref_definitions(options, pages, kind):
+def _check_unused_crossref_definitions(options, pages, links, kind):
     """Report defined cross-reference entries that are never referenced."""
     known = set(_get_crossref_definitions(options, pages, kind))
-    used = _get_crossref_usage(pages, kind)
+    used = _get_crossref_usage(links, kind)
     for key in sorted(known - used):
         _require(GLOBAL, False, f"unused {kind} key {key}")
 
@@ -295,7 +323,7 @@ def _check_output_files(options, dst_dir):
             continue
         rel = fp.relative_to(dst_dir)
         parts = rel.parts
-        if parts[0] == "_static":
+        if parts[0] in ("_static", str(util.CACHE_DIR)):
             continue
         if fp.name == "index.html":
             continue
@@ -306,8 +334,98 @@ def _check_output_files(options, dst_dir):
         _require(GLOBAL, False, f"unexpected file in output: {rel}")
 
 
+def _check_page(options, filepath, doc):
+    """Run the per-page checks on one page, keeping their messages and its links."""
+    nodes = util.collect_nodes(doc)
+    messages = {}
+    for func in _page_checks():
+        buf = io.StringIO()
+        with redirect_stderr(buf):
+            func(options, filepath, doc, nodes)
+        messages[func.__name__] = buf.getvalue()
+    return {"links": _page_links(doc, nodes), "messages": messages}
+
+
+def _check_page_file(options, filepath, parser):
+    """Parse and check one page, then free its tree."""
+    doc = _parse_page(filepath, parser)
+    result = _check_page(options, filepath, doc)
+    doc.decompose()
+    return result
+
+
+def _check_page_in_worker(filepath):
+    """Parse and check one page in a worker process and send back the results."""
+    return _check_page_file(_WORKER["options"], filepath, _WORKER["parser"])
+
+
+def _check_pages_in_workers(options, paths, parser, num_jobs):
+    """Check pages in parallel, returning {path: results} in the original order."""
+    with ProcessPoolExecutor(
+        max_workers=num_jobs, initializer=_init_worker, initargs=(options, parser)
+    ) as pool:
+        return dict(zip(paths, pool.map(_check_page_in_worker, paths)))
+
+
+def _index_links(results):
+    """Combine the links from each page into {kind: [(page, href, classes)]}."""
+    links = {kind: [] for kind in DEFINITION_KINDS}
+    for path, result in results.items():
+        for kind, href, classes in result["links"]:
+            links[kind].append((path, href, classes))
+    return links
+
+
+def _init_worker(options, parser):
+    """Set up options and the HTML parser once per worker process."""
+    _WORKER["options"] = options
+    _WORKER["parser"] = parser
+
+
+def _page_checks():
+    """Checks run on each page by itself, in the order their messages appear."""
+    return [
+        _check_empty_inclusions,
+        _check_figure_structure,
+        _check_single_h1,
+        _check_table_structure,
+        _check_unknown_links,
+    ]
+
+
+def _link_kind(href):
+    """Which kind of definition does a link refer to (if any)?"""
+    for kind in DEFINITION_KINDS:
+        if f"/{kind}/#" in href:
+            return kind
+    return None
+
+
+def _page_links(doc, nodes=None):
+    """Get (kind, href, classes) for each link on a page to a definition."""
+    result = []
+    for node in util.select_nodes(doc, nodes, "a[href]"):
+        kind = _link_kind(node["href"])
+        if kind is not None:
+            result.append((kind, node["href"], tuple(node.get("class", []))))
+    return result
+
+
+def _parse_page(filepath, parser):
+    """Read and parse one generated page."""
+    return util.make_soup(filepath.read_text(encoding="utf-8"), parser)
+
+
 def _require(filepath, condition, message):
     """Manage warning messages."""
     if not condition:
         print(f"{filepath}: {message}", file=sys.stderr)
     return condition
+
+
+def _validate_page(port, ignore, filepath):
+    """Validate one page, returning its complaints and any error along the way."""
+    try:
+        return validator.validate_page(port, filepath, ignore=ignore), None
+    except (OSError, ValueError) as exc:
+        return [], exc
@@ -1,54 +1,75 @@
 """Command-line user interface."""
 
 import argparse
-import importlib.metadata
+import importlib
 from pathlib import Path
 import sys
 
-from .bib import bib
-from .build import build
-from .check import check
-from .create import create
-from .describe import describe
-from .detab import detab, DEFAULT_TABSIZE
-from .single_page import build_single_page
+from . import __version__
+
+# Default number of spaces per tab stop for detab
+DEFAULT_TABSIZE = 4
+
+# Default port for the local HTML validator used by check (not 8888, which
+# Jupyter also uses by default)
+VALIDATOR_PORT = 8788
 
 
 def main():
     """Main driver."""
+    # Commands are {name: (module, function, parser maker, help)}; modules are
+    # only imported when their command runs so that startup stays fast.
     commands = {
-        "bib": (bib, _make_bib_parser, "validate bibliography"),
-        "build": (build, _make_build_parser, "build site"),
-        "check": (check, _make_check_parser, "check site"),
-        "create": (create, _make_create_parser, "create site"),
-        "describe": (describe, _make_describe_parser, "describe lesson contents"),
+        "bib": ("bib", "bib", _make_bib_parser, "validate bibliography"),
+        "build": ("build", "build", _make_build_parser, "build site"),
+        "check": ("check", "check", _make_check_parser, "check site"),
+        "create": ("create", "create", _make_create_parser, "create site"),
+        "describe": (
+            "describe",
+            "describe",
+            _make_describe_parser,
+            "describe lesson contents",
+        ),
         "detab": (
-            detab,
+            "detab",
+            "detab",
             _make_detab_parser,
             "replace tabs with spaces in Markdown files",
         ),
+        "serve": ("serve", "serve", _make_serve_parser, "serve site with live reload"),
     }
     parser = argparse.ArgumentParser()
     parser.add_argument("--verbose", type=int, default=0, help="logging level")
     parser.add_argument("--version", action="store_true", help="show version")
 
     subparsers = parser.add_subparsers(dest="command")
-    for cmd, (_, p, text) in commands.items():
+    for cmd, (_, _, p, text) in commands.items():
         p(subparsers.add_parser(cmd, help=text))
 
     args = parser.parse_args()
     if args.version:
-        print(importlib.metadata.version("mccole"))
+        print(__version__)
     elif args.command in commands:
-        result = commands[args.command][0](args)
+        module, func, _, _ = commands[args.command]
+        result = _load_command(module, func)(args)
         if args.command == "build" and getattr(args, "single_page", None):
             config, env = result
-            build_single_page(config, env, args.single_page)
+            _load_command("single_page", "build_single_page")(
+                config, env, args.single_page
+            )
+        if args.command == "build" and getattr(args, "watch", False):
+            config, env = result
+            _load_command("watch", "watch")(args, config, env)
     else:
         print(f"unknown command {args.command}", file=sys.stderr)
         sys.exit(1)
 
 
+def _load_command(module, func):
+    """Import a command's module and return the function that runs it."""
+    return getattr(importlib.import_module(f".{module}", __package__), func)
+
+
 def _make_bib_parser(parser):
     """Parse command-line arguments for validating bibliography."""
     parser.add_argument(
@@ -74,16 +95,53 @@ def _make_build_parser(parser):
         default=None,
         help="output path for single-page version",
     )
+    parser.add_argument(
+        "--force", action="store_true", help="rebuild pages even if unchanged"
+    )
     parser.add_argument(
         "--forma", action="store_true", help="enable formative assessments"
     )
+    parser.add_argument(
+        "--jobs", type=int, default=1, help="number of pages to render in parallel"
+    )
+    parser.add_argument(
+        "--link",
+        action="store_true",
+        help="hard-link non-Markdown files into the output instead of copying them",
+    )
     parser.add_argument(
         "--math", action="store_true", help="enable KaTeX math rendering"
     )
+    parser.add_argument(
+        "--parser",
+        default=None,
+        help="HTML parser to use (e.g., 'lxml', or 'fast' for the fastest installed)",
+    )
+    parser.add_argument(
+        "--profile",
+        type=Path,
+        default=None,
+        metavar="PATH",
+        help="time each stage of building each page and save the report as JSON",
+    )
     parser.add_argument(
         "--root", type=Path, default=Path("README.md"), help="root page file"
     )
     parser.add_argument("--src", type=Path, default=Path("."), help="source directory")
+    parser.add_argument(
+        "--validator",
+        action="store_true",
+        help="keep an HTML validator running for check while watching",
+    )
+    parser.add_argument(
+        "--validator-port",
+        type=int,
+        default=VALIDATOR_PORT,
+        help="port of the local HTML validator",
+    )
+    parser.add_argument(
+        "--watch", action="store_true", help="rebuild changed pages until interrupted"
+    )
 
 
 def _make_check_parser(parser):
@@ -97,9 +155,17 @@ def _make_check_parser(parser):
     parser.add_argument(
         "--root", type=Path, default=Path("README.md"), help="root page file"
     )
+    parser.add_argument(
+        "--parser",
+        default=None,
+        help="HTML parser to use (e.g., 'lxml', or 'fast' for the fastest installed)",
+    )
     parser.add_argument(
         "--relaxed", action="store_true", help="suppress div-in-summary HTML warnings"
     )
+    parser.add_argument(
+        "--jobs", type=int, default=1, help="number of pages to check in parallel"
+    )
     parser.add_argument(
         "--files",
         nargs="*",
@@ -108,6 +174,12 @@ def _make_check_parser(parser):
         help="report unexpected files in output directory (paths relative to output dir)",
     )
     parser.add_argument("--src", type=Path, default=Path("."), help="source directory")
+    parser.add_argument(
+        "--validator-port",
+        type=int,
+        default=VALIDATOR_PORT,
+        help="port of the local HTML validator (started if none is running)",
+    )
 
 
 def _make_create_parser(parser):
@@ -150,3 +222,10 @@ def _make_describe_parser(parser):
         "--root", type=Path, default=Path("README.md"), help="root page file"
     )
     parser.add_argument("--src", type=Path, default=Path("."), help="source directory")
+
+
+def _make_serve_parser(parser):
+    """Parse command-line arguments for serving site."""
+    _make_build_parser(parser)
+    parser.add_argument("--host", default="localhost", help="address to serve on")
+    parser.add_argument("--port", type=int, default=8000, help="port to serve on")
@@ -1,8 +1,5 @@
 """Describe contents of lesson files."""
 
-import re
-import shlex
-
 from . import util
 from .inclusions import (
     _filter_exclude,
@@ -10,55 +7,49 @@ from .inclusions import (
     _filter_include,
     _filter_scrub,
 )
-
-
-# Same pattern used by shortcodes.py
-_SHORTCODE_RE = re.compile(r"\[%\s*(/?[a-zA-Z_][a-zA-Z0-9_]*)(.*?)%\]", re.DOTALL)
+from .shortcodes import _SHORTCODE_RE, parse_args, split_args
 
 
 def describe(options):
     """Describe contents of lesson files."""
+    files = {}
     if options.bibliography:
-        _describe_bibliography(options)
+        _describe_bibliography(options, files)
     if options.glossary:
-        _describe_glossary(options)
+        _describe_glossary(options, files)
     if options.inc:
-        _describe_inclusions(options)
+        _describe_inclusions(options, files)
     if options.words:
-        _describe_words(options)
+        _describe_words(options, files)
 
 
 def _all_entries(options):
     """Return source file entries for lessons, appendices, and slides."""
-    order = util.load_order(options.src, options.root)
-    entries = list(order.values())
-    for slide in util.load_slides(options.src):
-        filepath = util.slides_src_file(options.src, slide["href"])
-        entries.append({"filepath": filepath})
+    project = util.load_project(options.src, options.root)
+    entries = list(project["order"].values())
+    for slide in project["slides"]:
+        entries.append({"filepath": slide["src_file"]})
     return entries
 
 
-def _describe_bibliography(options):
+def _describe_bibliography(options, files=None):
     """Print a table of bibliography keys and the files that reference them."""
+    files = {} if files is None else files
     refs = {}  # {key: [file, ...]} in source order, deduplicated per file
     for entry in _all_entries(options):
         src_path = entry["filepath"]
-        if not src_path.exists():
+        if not util.cached_exists(files, src_path):
             continue
         try:
             label = str(src_path.relative_to(options.src))
         except ValueError:
             label = str(src_path)
-        content = src_path.read_text(encoding="utf-8")
+        content = util.cached_text(files, src_path)
         seen_in_file = set()
         for match in _SHORTCODE_RE.finditer(content):
             if match.group(1) != "b":
                 continue
-            args_str = match.group(2).strip()
-            try:
-                tokens = shlex.split(args_str)
-            except ValueError:
-                tokens = args_str.split()
+            tokens = split_args(match.group(2).strip())
             for token in tokens:
                 key = token.strip("'\"")
                 if key and key not in seen_in_file:
@@ -78,28 +69,25 @@ def _describe_bibliography(options):
         print(fmt.format(key, ", ".join(refs[key])))
 
 
-def _describe_glossary(options):
+def _describe_glossary(options, files=None):
     """Print a table of glossary keys and the files that reference them."""
+    files = {} if files is None else files
     # Preserve README order for files; collect keys per file in that order
     refs = {}  # {key: [file, ...]} files in README order, deduplicated
     for entry in _all_entries(options):
         src_path = entry["filepath"]
-        if not src_path.exists():
+        if not util.cached_exists(files, src_path):
             continue
         try:
             label = str(src_path.relative_to(options.src))
         except ValueError:
             label = str(src_path)
-        content = src_path.read_text(encoding="utf-8")
+        content = util.cached_text(files, src_path)
         seen_in_file = set()
         for match in _SHORTCODE_RE.finditer(content):
             if match.group(1) != "g":
                 continue
-            args_str = match.group(2).strip()
-            try:
-                tokens = shlex.split(args_str)
-            except ValueError:
-                tokens = args_str.split()
+            tokens = split_args(match.group(2).strip())
             if not tokens:
                 continue
             key = tokens[0].strip("'\"")
@@ -120,21 +108,24 @@ def _describe_glossary(options):
         print(fmt.format(key, ", ".join(refs[key])))
 
 
-def _describe_inclusions(options):
+def _describe_inclusions(options, files=None):
     """Print a table of file inclusions found in lesson files."""
+    files = {} if files is None else files
     rows = []
 
     for entry in _all_entries(options):
         src_path = entry["filepath"]
-        if not src_path.exists():
+        if not util.cached_exists(files, src_path):
             continue
         try:
             rel_including = str(src_path.relative_to(options.src))
         except ValueError:
             rel_including = str(src_path)
 
-        content = src_path.read_text(encoding="utf-8")
-        for inc_file, modifiers, line_count in _find_inclusions(src_path, content):
+        content = util.cached_text(files, src_path)
+        for inc_file, modifiers, line_count in _find_inclusions(
+            src_path, content, files
+        ):
             inc_display = inc_file if not modifiers else f"{inc_file} ({modifiers})"
             rows.append((rel_including, inc_display, line_count))
 
@@ -153,56 +144,45 @@ def _describe_inclusions(options):
         print(fmt.format(lines, including, included))
 
 
-def _find_inclusions(src_path, content):
+def _find_inclusions(src_path, content, files=None):
     """Yield (inc_file, modifiers_str, line_count) for each [%inc%] in content."""
+    files = {} if files is None else files
     for match in _SHORTCODE_RE.finditer(content):
         tag = match.group(1)
         if tag != "inc":
             continue
 
-        args_str = match.group(2).strip()
-        try:
-            tokens = shlex.split(args_str)
-        except ValueError:
-            tokens = args_str.split()
-
-        pargs = []
-        kwargs = {}
-        for token in tokens:
-            if "=" in token:
-                key, _, value = token.partition("=")
-                kwargs[key.strip()] = value.strip().strip("'\"")
-            else:
-                pargs.append(token.strip("'\""))
+        pargs, kwargs = parse_args(match.group(2).strip())
 
         if "pat" in kwargs:
             pat = kwargs["pat"]
             for word in kwargs.get("fill", "").split():
                 filename = pat.replace("*", word) if "*" in pat else pat
                 filepath = src_path.parent / filename
-                if filepath.exists():
-                    lines, mods = _apply_filters(filepath, {})
+                if util.cached_exists(files, filepath):
+                    lines, mods = _apply_filters(filepath, {}, files)
                     yield filename, mods, len(lines)
         else:
             if not pargs:
                 continue
             filename = pargs[0]
             filepath = src_path.parent / filename
-            if not filepath.exists():
+            if not util.cached_exists(files, filepath):
                 continue
-            lines, mods = _apply_filters(filepath, kwargs)
+            lines, mods = _apply_filters(filepath, kwargs, files)
             yield filename, mods, len(lines)
 
 
-def _describe_words(options):
+def _describe_words(options, files=None):
     """Print a table of word counts for each lesson and appendix index.md."""
+    files = {} if files is None else files
     order = util.load_order(options.src, options.root)
     rows = []
     for slug, entry in order.items():
         src_path = entry["filepath"]
-        if not src_path.exists():
+        if not util.cached_exists(files, src_path):
             continue
-        content = src_path.read_text(encoding="utf-8")
+        content = util.cached_text(files, src_path)
         rows.append((slug, len(content.split())))
 
     if not rows:
@@ -218,9 +198,10 @@ def _describe_words(options):
         print(fmt.format(slug, count))
 
 
-def _apply_filters(filepath, kwargs):
+def _apply_filters(filepath, kwargs, files=None):
     """Apply inclusion filters and return (lines, modifiers_str)."""
-    lines = filepath.read_text(encoding="utf-8").splitlines()
+    files = {} if files is None else files
+    lines = util.cached_text(files, filepath).splitlines()
     parts = []
 
     mark = kwargs.get("mark", "")
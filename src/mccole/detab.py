@@ -2,9 +2,6 @@
 
 from . import util
 
-# Default number of spaces per tab stop
-DEFAULT_TABSIZE = 4
-
 
 def detab(options):
     """Replace tabs with spaces in lesson and appendix Markdown files."""
@@ -1,16 +1,23 @@
 """Handle file inclusions with filtering."""
 
+import hashlib
+import json
+import os
 import re
 from pathlib import Path
-from bs4 import BeautifulSoup
+import pygments
 from pygments import highlight
 from pygments.formatters import HtmlFormatter
 from pygments.lexers import get_lexer_for_filename, get_lexer_by_name
 from pygments.util import ClassNotFound
 
+from . import __version__
 from . import util
 
 
+# Cached highlighted inclusions (relative to output directory)
+INCLUSION_CACHE_DIR = util.CACHE_DIR / "inclusions"
+
 # Comment prefix and suffix for different file types
 COMMENT_FORMATS = {
     ".c": ("//", ""),
@@ -33,10 +40,38 @@ COMMENT_FORMATS = {
     ".xml": ("<!--", "-->"),
 }
 
+# Pygments lexer names for the file types in COMMENT_FORMATS
+LEXER_NAMES = {
+    ".c": "c",
+    ".cpp": "cpp",
+    ".css": "css",
+    ".gleam": "gleam",
+    ".html": "html",
+    ".java": "java",
+    ".js": "javascript",
+    ".json": "json",
+    ".lean": "lean4",
+    ".lua": "lua",
+    ".py": "python",
+    ".r": "r",
+    ".rs": "rust",
+    ".sh": "bash",
+    ".sql": "tsql",
+    ".ts": "typescript",
+    ".txt": "text",
+    ".xml": "xml",
+}
+
+# Lexers for included files, keyed by suffix or file name, created on first use
+_LEXERS = {}
 
-def patch_inclusions(config, src_path, dst_path, doc):
+# Formatter shared by all included files
+_FORMATTER = HtmlFormatter(cssclass="codehilite", wrapcode=True)
+
+
+def patch_inclusions(config, src_path, dst_path, doc, nodes=None):
     """Replace div elements with included file content."""
-    for node in doc.select("div[data-inc]"):
+    for node in util.select_nodes(doc, nodes, "div[data-inc]"):
         inc_file = node["data-inc"]
         mark = node.get("data-mark", "")
         omit = node.get("data-omit", "")
@@ -44,27 +79,20 @@ def patch_inclusions(config, src_path, dst_path, doc):
         scrub = node.get("data-scrub", "")
         try:
             filepath = src_path.parent / inc_file
-            if not filepath.exists():
+            if not util.cached_exists(util.file_cache(config), filepath):
                 raise FileNotFoundError(f"file {inc_file} not found")
-            lines = filepath.read_text(encoding="utf-8").splitlines()
-            if mark:
-                lines = _filter_include(filepath, lines, mark)
-            if omit:
-                lines = _filter_exclude(filepath, lines, omit)
-            if head:
-                lines = _filter_head(lines, head)
-            if scrub:
-                lines = _filter_scrub(lines, scrub)
-            marker_missing = mark and not lines
-            if marker_missing:
+            included = _highlight_file(
+                config, filepath, inc_file, mark, omit, head, scrub
+            )
+            if included["marker_missing"]:
                 util.warn(
                     f"{dst_path}: marker '{mark}' not found or empty in {inc_file}"
                 )
-            content = "\n".join(lines)
-            if not marker_missing and not content.strip():
+            elif included["empty"]:
                 util.warn(f"{dst_path}: empty content from {inc_file}")
-            highlighted = _colorize_code(content, inc_file)
-            soup = BeautifulSoup(highlighted, "html.parser")
+            soup = util.make_soup(
+                included["html"], config.get("parser", util.HTML_PARSER)
+            )
             try:
                 display_path = str(filepath.relative_to(config["src"]))
             except ValueError:
@@ -80,25 +108,110 @@ def patch_inclusions(config, src_path, dst_path, doc):
                 },
             )
             icon.string = "i"
+            # Some parsers wrap fragments in <html><body>
+            fragment = soup if soup.body is None else soup.body
             node.clear()
             node.append(icon)
-            node.append(soup)
+            node.extend(list(fragment.contents))
+            if nodes is not None:
+                util.collect_nodes(node, nodes)
         except Exception as exc:
             util.warn(f"unable to include {inc_file} in {dst_path}: {exc}")
 
 
-def _colorize_code(content, filepath):
+def _cache_path(config, key):
+    """Where a highlighted inclusion is cached (None if not caching)."""
+    if (config.get("output") is not None) or ("dst" not in config):
+        return None
+    return config["dst"] / INCLUSION_CACHE_DIR / f"{key}.json"
+
+
+def _colorize_code(content, filepath, lexer=None):
     """Colorize code using pygments based on file type."""
-    try:
-        lexer = get_lexer_for_filename(str(filepath))
-    except ClassNotFound:
-        lexer = get_lexer_by_name("text")
+    if lexer is None:
+        lexer = _get_lexer(filepath)
+    return highlight(content, lexer, _FORMATTER)
 
-    formatter = HtmlFormatter(
-        cssclass="codehilite",
-        wrapcode=True,
-    )
-    return highlight(content, lexer, formatter)
+
+def _get_lexer(filepath, overrides=None):
+    """Find the lexer for a file, preferring names or suffixes from the configuration."""
+    path = Path(filepath)
+    overrides = overrides or {}
+    for key in (path.name, path.suffix):
+        if key in overrides:
+            return _registered_lexer(key, alias=overrides[key])
+    if path.suffix in LEXER_NAMES:
+        return _registered_lexer(path.suffix, alias=LEXER_NAMES[path.suffix])
+    return _registered_lexer(path.name, filename=path.name)
+
+
+def _registered_lexer(key, filename=None, alias=None):
+    """Get a lexer from the registry, falling back to plain text."""
+    if (key, alias) not in _LEXERS:
+        try:
+            if alias is None:
+                lexer = get_lexer_for_filename(filename)
+            else:
+                lexer = get_lexer_by_name(alias)
+        except ClassNotFound:
+            if alias is not None:
+                util.warn(f"unknown lexer '{alias}' for '{key}'")
+            lexer = get_lexer_by_name("text")
+        _LEXERS[(key, alias)] = lexer
+    return _LEXERS[(key, alias)]
+
+
+def _highlight_file(config, filepath, inc_file, mark, omit, head, scrub):
+    """Filter and colorize an included file, reusing cached results."""
+    raw = util.cached_bytes(util.file_cache(config), filepath)
+    lexer = _get_lexer(inc_file, config.get("lexers"))
+    digest = hashlib.sha256(raw)
+    for part in (
+        __version__,
+        pygments.__version__,
+        type(lexer).__name__,
+        filepath.suffix.lower(),
+        mark,
+        omit,
+        head,
+        scrub,
+    ):
+        digest.update(b"\0" + part.encode("utf-8"))
+    cache_path = _cache_path(config, digest.hexdigest())
+
+    if cache_path is not None:
+        try:
+            return json.loads(cache_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            pass
+
+    lines = raw.decode("utf-8").splitlines()
+    if mark:
+        lines = _filter_include(filepath, lines, mark)
+    if omit:
+        lines = _filter_exclude(filepath, lines, omit)
+    if head:
+        lines = _filter_head(lines, head)
+    if scrub:
+        lines = _filter_scrub(lines, scrub)
+    content = "\n".join(lines)
+    included = {
+        "html": _colorize_code(content, inc_file, lexer),
+        "marker_missing": bool(mark and not lines),
+        "empty": not content.strip(),
+    }
+
+    if cache_path is not None:
+        _save_cached(cache_path, included)
+    return included
+
+
+def _save_cached(cache_path, included):
+    """Save a highlighted inclusion, replacing the file in one step."""
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}")
+    temp_path.write_text(json.dumps(included), encoding="utf-8")
+    os.replace(temp_path, cache_path)
 
 
 def _filter_head(lines, n_str):
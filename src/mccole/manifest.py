@@ -0,0 +1,106 @@
+"""Record build inputs so that unchanged pages can be skipped."""
+
+import hashlib
+import json
+
+from . import __version__
+from .shortcodes import find_dependencies
+from . import util
+
+
+MANIFEST_PATH = util.CACHE_DIR / "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def empty_manifest():
+    """Make a manifest that matches nothing."""
+    return {"version": MANIFEST_VERSION, "global": "", "pages": {}}
+
+
+def load_manifest(dst):
+    """Load the manifest from the output directory (empty if missing or stale)."""
+    path = dst / MANIFEST_PATH
+    try:
+        manifest = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return empty_manifest()
+    if manifest.get("version") != MANIFEST_VERSION:
+        return empty_manifest()
+    return manifest
+
+
+def save_manifest(dst, manifest):
+    """Save the manifest in the output directory if it has changed."""
+    path = dst / MANIFEST_PATH
+    path.parent.mkdir(parents=True, exist_ok=True)
+    util.write_if_changed(path, json.dumps(manifest, indent=1, sort_keys=True))
+
+
+def global_hash(config):
+    """Hash the inputs that every page depends on."""
+    paths = [
+        config["config"],
+        config["src"] / config["home_page"],
+        config["src"] / util.LINKS_PATH,
+        config["src"] / util.GLOSSARY_PATH,
+        *sorted(config["templates"].rglob("*.html")),
+    ]
+    digest = hashlib.sha256()
+    digest.update(__version__.encode("utf-8"))
+    for key in ("extra_html", "forma", "math", "parser"):
+        digest.update(f"{key}={config.get(key, '')!r}".encode("utf-8"))
+    for path in paths:
+        _update_digest(digest, path)
+    return digest.hexdigest()
+
+
+def page_entry(config, src_path):
+    """Build the manifest entry for a source page: its hash and dependencies."""
+    try:
+        text = src_path.read_text(encoding="utf-8")
+        deps = find_dependencies(text, config, src_path)
+    except OSError:
+        deps = set()
+    deps = sorted({src_path, *deps})
+    digest = hashlib.sha256()
+    for path in deps:
+        _update_digest(digest, path)
+    return {
+        "hash": digest.hexdigest(),
+        "deps": [source_key(config, path) for path in deps],
+    }
+
+
+def index_entry(config, src_path, ix_entries):
+    """Build the manifest entry for the generated index page."""
+    digest = hashlib.sha256()
+    _update_digest(digest, src_path)
+    digest.update(json.dumps(ix_entries, sort_keys=True).encode("utf-8"))
+    return {"hash": digest.hexdigest(), "deps": [source_key(config, src_path)]}
+
+
+def is_unchanged(previous, current, key, output_exists):
+    """Can the existing output for this page be reused?"""
+    if previous["global"] != current["global"]:
+        return False
+    if not output_exists:
+        return False
+    old = previous["pages"].get(key)
+    return (old is not None) and (old["hash"] == current["pages"][key]["hash"])
+
+
+def source_key(config, path):
+    """Identify a file by its path relative to the source directory if possible."""
+    try:
+        return str(path.relative_to(config["src"]))
+    except ValueError:
+        return str(path)
+
+
+def _update_digest(digest, path):
+    """Add a file's path and contents (or its absence) to a hash."""
+    digest.update(str(path).encode("utf-8"))
+    try:
+        digest.update(path.read_bytes())
+    except OSError:
+        digest.update(b"\0missing")
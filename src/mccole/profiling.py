@@ -0,0 +1,104 @@
+"""Record how long each stage of building a page takes."""
+
+from contextlib import contextmanager, nullcontext
+import json
+import time
+
+
+def make_report(timings):
+    """Combine per-page timings into a report with totals for each stage."""
+    total = {}
+    for stages in timings.values():
+        _add_stages(total, stages)
+    return {"pages": timings, "total": total}
+
+
+def merge_timings(timings, other):
+    """Add timings recorded elsewhere (e.g., in a worker) to these."""
+    for page, stages in other.items():
+        _add_stages(timings.setdefault(page, {}), stages)
+
+
+def print_report(report):
+    """Print stage totals and per-page times as tables."""
+    if not report["pages"]:
+        return
+    total = report["total"]
+    all_seconds = sum(entry["seconds"] for entry in total.values()) or 1.0
+    rows = [
+        (
+            name,
+            str(entry["calls"]),
+            f"{entry['seconds']:.3f}",
+            f"{100 * entry['seconds'] / all_seconds:.1f}",
+        )
+        for name, entry in sorted(total.items(), key=lambda item: -item[1]["seconds"])
+    ]
+    _print_table(("Stage", "Calls", "Seconds", "%"), rows, (">", ">", ">"))
+
+    pages = []
+    for page, stages in report["pages"].items():
+        slowest = max(stages, key=lambda name: stages[name]["seconds"])
+        seconds = sum(entry["seconds"] for entry in stages.values())
+        pages.append((page, seconds, slowest))
+    rows = [
+        (page, f"{seconds:.3f}", slowest)
+        for page, seconds, slowest in sorted(pages, key=lambda row: -row[1])
+    ]
+    print()
+    _print_table(("Page", "Seconds", "Slowest"), rows, (">", "<"))
+
+
+def save_report(path, report):
+    """Save a timing report as JSON."""
+    path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+def stage(config, src_path, name):
+    """Time one stage of building a page if the build is being profiled."""
+    timings = config.get("timings")
+    if timings is None:
+        return nullcontext()
+    return _time_stage(timings.setdefault(_page_label(config, src_path), {}), name)
+
+
+def _add_stages(known, stages):
+    """Add the times and calls for some stages to those already known."""
+    for name, entry in stages.items():
+        total = known.setdefault(name, {"seconds": 0.0, "calls": 0})
+        total["seconds"] += entry["seconds"]
+        total["calls"] += entry["calls"]
+
+
+def _page_label(config, src_path):
+    """Name a page by its path relative to the source directory if possible."""
+    try:
+        return str(src_path.relative_to(config["src"]))
+    except (KeyError, ValueError):
+        return str(src_path)
+
+
+def _print_table(headers, rows, aligns):
+    """Print rows under headers, left-aligning the first column."""
+    widths = [
+        max(len(headers[i]), *(len(row[i]) for row in rows))
+        for i in range(len(headers))
+    ]
+    aligns = ("<", *aligns)
+    fmt = "  ".join(f"{{:{a}{w}}}" for a, w in zip(aligns, widths))
+    print(fmt.format(*headers).rstrip())
+    print("  ".join("-" * w for w in widths))
+    for row in rows:
+        print(fmt.format(*row).rstrip())
+
+
+@contextmanager
+def _time_stage(stages, name):
+    """Add the time taken by the body of a with statement to a stage."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        entry = stages.setdefault(name, {"seconds": 0.0, "calls": 0})
+        entry["seconds"] += time.perf_counter() - start
+        entry["calls"] += 1
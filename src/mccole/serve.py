@@ -0,0 +1,141 @@
+"""Serve the site from memory and reload browsers when pages change."""
+
+from functools import partial
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import mimetypes
+from pathlib import Path
+import threading
+from urllib.parse import unquote, urlsplit
+
+from .build import build
+from .watch import watch
+
+
+# URL that browsers listen to for reload events
+RELOAD_URL = "/__mccole__/reload"
+
+# Injected into every HTML page so that it reloads when the site changes
+RELOAD_SCRIPT = (
+    f'<script>new EventSource("{RELOAD_URL}")'
+    ".onmessage = () => location.reload();</script>"
+)
+
+# Seconds between keep-alive messages on the reload stream
+KEEPALIVE_INTERVAL = 15.0
+
+
+def serve(options):
+    """Build the site into memory, serve it, and rebuild pages as they change."""
+    output = {}
+    config, env = build(options, output)
+    reloader = {"version": 0, "changed": threading.Condition()}
+
+    handler = partial(_Handler, config, output, reloader)
+    server = ThreadingHTTPServer((options.host, options.port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    print(f"serving http://{options.host}:{options.port}/")
+
+    try:
+        watch(options, config, env, notify=partial(_notify, reloader))
+    finally:
+        server.shutdown()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Answer requests from the in-memory output map."""
+
+    def __init__(self, config, output, reloader, *args, **kwargs):
+        self.config = config
+        self.output = output
+        self.reloader = reloader
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        path = unquote(urlsplit(self.path).path)
+        if path == RELOAD_URL:
+            self._send_reload_events()
+            return
+
+        dst_path = _output_path(self.config, path)
+        if path.endswith("/"):
+            dst_path = dst_path / "index.html"
+        elif (dst_path not in self.output) and (
+            (dst_path / "index.html") in self.output
+        ):
+            self.send_response(HTTPStatus.MOVED_PERMANENTLY)
+            self.send_header("Location", f"{path}/")
+            self.end_headers()
+            return
+
+        content = self.output.get(dst_path)
+        if content is None:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+
+        if isinstance(content, Path):
+            body = content.read_bytes()
+            content_type = mimetypes.guess_type(dst_path.name)[0]
+        else:
+            body = _inject_reload(content).encode("utf-8")
+            content_type = "text/html; charset=utf-8"
+
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", content_type or "application/octet-stream")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.config["verbose"] > 0:
+            super().log_message(format, *args)
+
+    def _send_reload_events(self):
+        """Hold the connection open and send an event each time the site changes."""
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        changed = self.reloader["changed"]
+        with changed:
+            seen = self.reloader["version"]
+        try:
+            while True:
+                with changed:
+                    changed.wait_for(
+                        lambda: self.reloader["version"] != seen,
+                        timeout=KEEPALIVE_INTERVAL,
+                    )
+                    current = self.reloader["version"]
+                if current != seen:
+                    seen = current
+                    self.wfile.write(b"data: reload\n\n")
+                else:
+                    self.wfile.write(b": keep-alive\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def _inject_reload(html):
+    """Add the reload script to an HTML page."""
+    index = html.rfind("</body>")
+    if index < 0:
+        return html + RELOAD_SCRIPT
+    return html[:index] + RELOAD_SCRIPT + html[index:]
+
+
+def _notify(reloader):
+    """Tell waiting browsers that the site has changed."""
+    with reloader["changed"]:
+        reloader["version"] += 1
+        reloader["changed"].notify_all()
+
+
+def _output_path(config, url_path):
+    """Convert a URL path to the output path used as a key in the output map."""
+    parts = [p for p in url_path.split("/") if p and p not in (".", "..")]
+    return config["dst"].joinpath(*parts)
@@ -1,7 +1,7 @@
 """Shortcode pre-processor: transforms [%tag args%] patterns into HTML before markdown()."""
 
+from functools import lru_cache
 import re
-import shlex
 import yaml
 
 from . import util
@@ -10,6 +10,22 @@ from . import util
 # Matches [%tag args%] or [% tag args %] or [%/tag%] (closing tags)
 _SHORTCODE_RE = re.compile(r"\[%\s*(/?[a-zA-Z_][a-zA-Z0-9_]*)(.*?)%\]", re.DOTALL)
 
+# Shortcodes whose output depends on the contents of other files
+_DEPENDENCY_TAGS = {"inc", "linecount", "table", "thanks"}
+
+# Argument tokens follow POSIX shell rules (as shlex.split does): a token is a
+# run of bare characters, 'single-quoted' text, "double-quoted" text in which
+# backslash escapes only " and \, and backslash-escaped characters.
+_ARG_SPACE = " \t\r\n"
+_ARG_PIECE = rf"""[^{_ARG_SPACE}'"\\]+|'[^']*'|"(?:[^"\\]|\\.)*"|\\."""
+_ARG_PIECE_RE = re.compile(_ARG_PIECE, re.DOTALL)
+_ARG_TOKEN_RE = re.compile(rf"(?:{_ARG_PIECE})+", re.DOTALL)
+_ARG_SPACE_RE = re.compile(rf"[{_ARG_SPACE}]*")
+_ARG_ESCAPE_RE = re.compile(r'\\(["\\])')
+
+# Number of distinct argument strings whose parsed form is remembered
+_PARSED_ARGS_SIZE = 4096
+
 
 def process_shortcodes(text, config, src_path, ix_entries):
     """
@@ -33,21 +49,7 @@ def process_shortcodes(text, config, src_path, ix_entries):
         if tag.startswith("/"):
             return ""
 
-        # Parse args: shlex.split, tokens with '=' are kwargs, others are pargs
-        try:
-            tokens = shlex.split(args_str)
-        except ValueError:
-            tokens = args_str.split()
-
-        pargs = []
-        kwargs = {}
-        for token in tokens:
-            if "=" in token:
-                key, _, value = token.partition("=")
-                kwargs[key.strip()] = value.strip().strip("'\"")
-            else:
-                pargs.append(token.strip("'\""))
-
+        pargs, kwargs = parse_args(args_str)
         handler = _HANDLERS.get(tag)
         if handler is None:
             util.warn(f"unknown shortcode [{tag}] in {src_path}")
@@ -58,6 +60,88 @@ def process_shortcodes(text, config, src_path, ix_entries):
     return _SHORTCODE_RE.sub(_replace, text)
 
 
+def parse_args(args_str):
+    """
+    Split shortcode arguments into positional and keyword arguments.
+
+    Tokens are split as by split_args; tokens containing '=' are kwargs and
+    everything else is a positional argument.
+    """
+    pargs, kwargs = _parse_args_cached(args_str)
+    return list(pargs), dict(kwargs)
+
+
+def split_args(args_str):
+    """
+    Split shortcode arguments into tokens the way shlex.split does.
+
+    Falls back to splitting on whitespace if quotes are unbalanced or the
+    text ends with a backslash.
+    """
+    tokens = []
+    pos = _ARG_SPACE_RE.match(args_str).end()
+    while pos < len(args_str):
+        match = _ARG_TOKEN_RE.match(args_str, pos)
+        if match is None:
+            return args_str.split()
+        tokens.append(_unquote_arg(match.group()))
+        pos = _ARG_SPACE_RE.match(args_str, match.end()).end()
+    return tokens
+
+
+def find_dependencies(text, config, src_path):
+    """Return the set of source-side files that shortcodes in text read."""
+    result = set()
+    for match in _SHORTCODE_RE.finditer(text):
+        tag = match.group(1)
+        if tag not in _DEPENDENCY_TAGS:
+            continue
+        pargs, kwargs = parse_args(match.group(2).strip())
+        if tag == "thanks":
+            result.add(config["extras"] / "thanks.yml")
+        elif tag == "table":
+            if kwargs.get("tbl"):
+                result.add(src_path.parent / kwargs["tbl"])
+        elif "pat" in kwargs:
+            pat = kwargs["pat"]
+            for word in kwargs.get("fill", "").split():
+                result.add(src_path.parent / pat.replace("*", word))
+        elif pargs:
+            result.add(src_path.parent / pargs[0])
+    return result
+
+
+@lru_cache(maxsize=_PARSED_ARGS_SIZE)
+def _parse_args_cached(args_str):
+    """Parse an argument string once, returning tuples that callers copy."""
+    pargs = []
+    kwargs = {}
+    for token in split_args(args_str):
+        if "=" in token:
+            key, _, value = token.partition("=")
+            kwargs[key.strip()] = value.strip().strip("'\"")
+        else:
+            pargs.append(token.strip("'\""))
+    return tuple(pargs), tuple(kwargs.items())
+
+
+def _unquote_arg(token):
+    """Remove the quotes and escapes from one argument token."""
+    if ("'" not in token) and ('"' not in token) and ("\\" not in token):
+        return token
+    parts = []
+    for piece in _ARG_PIECE_RE.findall(token):
+        if piece[0] == "'":
+            parts.append(piece[1:-1])
+        elif piece[0] == '"':
+            parts.append(_ARG_ESCAPE_RE.sub(r"\1", piece[1:-1]))
+        elif piece[0] == "\\":
+            parts.append(piece[1])
+        else:
+            parts.append(piece)
+    return "".join(parts)
+
+
 def _missing_shortcode_arg(tag, name, src_path, default=""):
     """Warn consistently when a shortcode argument is missing."""
     util.warn(f"[%{tag}%] shortcode missing {name} in {src_path}")
@@ -74,6 +158,32 @@ def _crossref_link(css_class, href, text=""):
     return f'<a class="{css_class}" href="{href}">{text}</a>'
 
 
+def _count_lines(text):
+    """Count the non-blank lines in some text."""
+    return str(sum(1 for line in text.splitlines() if line.strip()))
+
+
+def _format_thanks(text):
+    """Format the contributors listed in thanks.yml as an English list."""
+    data = yaml.safe_load(text) or []
+    names = []
+    for person in data:
+        order = person.get("order", "pf")
+        if order == "fp":
+            names.append(f"{person['family']} {person['personal']}")
+        elif order == "pmf":
+            names.append(f"{person['personal']} {person['middle']} {person['family']}")
+        else:
+            names.append(f"{person['personal']} {person['family']}")
+    if len(names) == 0:
+        return ""
+    if len(names) == 1:
+        return names[0]
+    if len(names) == 2:
+        return f"{names[0]} and {names[1]}"
+    return ", ".join(names[:-1]) + f", and {names[-1]}"
+
+
 # ---------------------------------------------------------------------------
 # Individual shortcode handlers
 # All have signature: (pargs, kwargs, config, src_path, ix_entries, ix_counter) -> str
@@ -149,9 +259,9 @@ def _handle_linecount(pargs, kwargs, config, src_path, ix_entries, ix_counter):
     filename = pargs[0]
     filepath = src_path.parent / filename
     try:
-        lines = filepath.read_text(encoding="utf-8").splitlines()
-        count = sum(1 for line in lines if line.strip())
-        return str(count)
+        return util.cached_value(
+            util.file_cache(config), filepath, "linecount", _count_lines
+        )
     except Exception as exc:
         util.warn(f"[%linecount%] unable to read {filepath}: {exc}")
         return "0"
@@ -204,7 +314,7 @@ def _handle_inc_pattern(pargs, kwargs, config, src_path, ix_entries, ix_counter)
             filename = pat
 
         filepath = src_path.parent / filename
-        if not filepath.exists():
+        if not util.cached_exists(util.file_cache(config), filepath):
             util.warn(f"[%inc pat=%] file {filepath} does not exist, skipping")
             continue
         parts.append(f'<div data-inc="{filename}"></div>')
@@ -246,7 +356,7 @@ def _handle_table(pargs, kwargs, config, src_path, ix_entries, ix_counter):
 
     filepath = src_path.parent / tbl
     try:
-        file_content = filepath.read_text(encoding="utf-8")
+        file_content = util.cached_text(util.file_cache(config), filepath)
     except Exception as exc:
         util.warn(f"[%table%] unable to read {filepath}: {exc}")
         return f'<div id="t:{slug}" data-caption="{caption}" markdown="1"><!-- error reading {tbl} --></div>'
@@ -279,25 +389,9 @@ def _handle_thanks(pargs, kwargs, config, src_path, ix_entries, ix_counter):
     """[% thanks %] → comma-separated list of contributor names from _extras/thanks.yml."""
     thanks_path = config["extras"] / "thanks.yml"
     try:
-        data = yaml.safe_load(thanks_path.read_text(encoding="utf-8")) or []
-        names = []
-        for person in data:
-            order = person.get("order", "pf")
-            if order == "fp":
-                names.append(f"{person['family']} {person['personal']}")
-            elif order == "pmf":
-                names.append(
-                    f"{person['personal']} {person['middle']} {person['family']}"
-                )
-            else:
-                names.append(f"{person['personal']} {person['family']}")
-        if len(names) == 0:
-            return ""
-        if len(names) == 1:
-            return names[0]
-        if len(names) == 2:
-            return f"{names[0]} and {names[1]}"
-        return ", ".join(names[:-1]) + f", and {names[-1]}"
+        return util.cached_value(
+            util.file_cache(config), thanks_path, "thanks", _format_thanks
+        )
     except Exception as exc:
         util.warn(f"[%thanks%] unable to read {thanks_path}: {exc}")
         return "the contributors"
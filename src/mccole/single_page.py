@@ -1,7 +1,6 @@
 """Build single-page version of site."""
 
 from pathlib import Path
-from bs4 import BeautifulSoup
 
 from .build import _build_page_fragment
 from . import util
@@ -87,7 +86,7 @@ def build_single_page(config, env, output_path):
 
     output_path = Path(output_path)
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    output_path.write_text(rendered, encoding="utf-8")
+    util.write_if_changed(output_path, rendered)
 
 
 def _apply_compound_figure_numbers(main, dst_path, chapter_number):
@@ -122,7 +121,7 @@ def _apply_compound_figure_numbers(main, dst_path, chapter_number):
 
 def _apply_compound_table_numbers(main, dst_path, chapter_number):
     """Number tables as chapter_number.N and fill cross-ref link text."""
-    factory = BeautifulSoup("", "html.parser")
+    factory = util.make_soup("")
     known = {}
     for num, node in enumerate(main.select("div[id^='t:']"), start=1):
         if "data-caption" not in node.attrs:
@@ -1,17 +1,29 @@
 """Utilities."""
 
+import errno
+import os
 from pathlib import Path
+import re
 import sys
+import threading
 
 from bs4 import BeautifulSoup
-from markdown import markdown
+from bs4.builder import builder_registry
+from markdown import Markdown
+from markdown.treeprocessors import Treeprocessor
 
 
+CACHE_DIR = Path(".mccole")
 EXTRAS_DIR = Path("_extras")
 LINKS_PATH = EXTRAS_DIR / "links.md"
+GLOSSARY_PATH = Path("glossary") / "index.md"
 
 HOME_PAGE = Path("README.md")
 
+# Default HTML parser, and faster ones to try (in order) for --parser fast
+HTML_PARSER = "html.parser"
+FAST_HTML_PARSERS = ["lxml"]
+
 STANDARD_FILES = {
     "README.md": "",
     "CODE_OF_CONDUCT.md": "conduct",
@@ -29,6 +41,125 @@ MARKDOWN_EXTENSIONS = [
     "tables",
 ]
 
+# Selectors used by page patchers and checks, grouped by tag, with the test each
+# node must pass
+NODE_SELECTORS = {
+    "a": [("a[href]", lambda node: "href" in node.attrs)],
+    "code": [("pre>code", lambda node: node.parent.name == "pre")],
+    "div": [
+        ("div[data-caption]", lambda node: "data-caption" in node.attrs),
+        ("div[data-inc]", lambda node: "data-inc" in node.attrs),
+        ("div[id^='t:']", lambda node: node.get("id", "").startswith("t:")),
+    ],
+    "figure": [("figure", None)],
+    "h1": [("h1", None)],
+    "img": [("img[src]", lambda node: "src" in node.attrs)],
+    "link": [("link[href]", lambda node: "href" in node.attrs)],
+    "p": [("p#terms", lambda node: node.get("id") == "terms")],
+    "pre": [("pre", None)],
+    "script": [("script[src]", lambda node: "src" in node.attrs)],
+    "section": [
+        ("section.exercises", lambda node: "exercises" in node.get("class", []))
+    ],
+    "th": [
+        ("thead th", lambda node: node.find_parent("thead") is not None),
+        ("tbody th", lambda node: node.find_parent("tbody") is not None),
+    ],
+    "title": [("title", None)],
+}
+MARKDOWN_SELECTOR = "[markdown]"
+
+# Book title and repository link in the home page's Markdown
+RE_BOOK_TITLE = re.compile(r"^#\s+(.+)$", re.MULTILINE)
+RE_BOOK_REPO = re.compile(r"^\[repo\]:\s+(.+)$", re.MULTILINE)
+
+# Project models loaded so far: {(src_path, home_page): model}
+_PROJECTS = {}
+
+# Markdown converters, one per thread, reset and reused for each document
+_CONVERTERS = threading.local()
+
+# Name and priority of the step that adds site-wide link references: after
+# the page's blocks (and its own references) are read, before inline links
+_REFERENCES = "mccole_references"
+_REFERENCES_PRIORITY = 25
+
+
+def cached_bytes(files, path):
+    """Read a file's bytes once per version, raising OSError if it can't be read."""
+    entry = _cache_entry(files, path)
+    if entry["stamp"] is None:
+        raise FileNotFoundError(
+            errno.ENOENT, "No such file or directory", str(Path(path))
+        )
+    values = entry["values"]
+    if "bytes" not in values:
+        values["bytes"] = Path(path).read_bytes()
+    return values["bytes"]
+
+
+def cached_exists(files, path):
+    """Does a file exist (checked once per build)?"""
+    return _cache_entry(files, path)["stamp"] is not None
+
+
+def cached_text(files, path):
+    """Read a file as UTF-8 text with universal newlines once per version."""
+    return cached_value(files, path, "text", lambda text: text)
+
+
+def cached_value(files, path, name, make):
+    """Compute a value from a file's text once per version of the file."""
+    values = _cache_entry(files, path)["values"]
+    key = ("value", name)
+    if key not in values:
+        raw = cached_bytes(files, path).decode("utf-8")
+        values[key] = make(raw.replace("\r\n", "\n").replace("\r", "\n"))
+    return values[key]
+
+
+def collect_nodes(root, nodes=None):
+    """Walk a document once and group its nodes by patcher selector."""
+    if nodes is None:
+        nodes = {
+            selector: []
+            for entries in NODE_SELECTORS.values()
+            for selector, _ in entries
+        }
+        nodes[MARKDOWN_SELECTOR] = []
+    for node in root.find_all(True):
+        for selector, test in NODE_SELECTORS.get(node.name, ()):
+            if (test is None) or test(node):
+                nodes[selector].append(node)
+        if "markdown" in node.attrs:
+            nodes[MARKDOWN_SELECTOR].append(node)
+    return nodes
+
+
+def file_cache(config):
+    """Get the cache of files read during a build, creating it if necessary."""
+    return config.setdefault("files", {})
+
+
+def html_parser(name=None):
+    """Choose an installed HTML parser, falling back to the default."""
+    if name is None:
+        return HTML_PARSER
+    candidates = FAST_HTML_PARSERS if name == "fast" else [name]
+    for candidate in candidates:
+        if builder_registry.lookup(candidate) is not None:
+            return candidate
+    warn(f"HTML parser '{name}' is not available, using '{HTML_PARSER}'")
+    return HTML_PARSER
+
+
+def load_glossary(src_path, parser=HTML_PARSER):
+    """Load glossary keys and terms."""
+    md = (src_path / GLOSSARY_PATH).read_text(encoding="utf-8")
+    html = markdown_to_html(md)
+    doc = make_soup(html, parser)
+    return {node["id"]: node.decode_contents() for node in doc.select("span[id]")}
+
 
 def load_links(src_path):
     """Read links file if available."""
@@ -38,36 +169,68 @@ def load_links(src_path):
 
 def load_order(src_path, home_page):
     """Determine section order from home page file."""
-    md = (src_path / home_page).read_text(encoding="utf-8")
-    html = markdown(md, extensions=MARKDOWN_EXTENSIONS)
-    doc = BeautifulSoup(html, "html.parser")
-    lessons = _load_order_section(doc, "lessons", lambda i: str(i + 1))
-    appendices = _load_order_section(doc, "appendices", lambda i: chr(ord("A") + i))
-    combined = {**lessons, **appendices}
+    return load_project(src_path, home_page)["order"]
 
-    flattened = list(combined.keys())
-    for i, slug in enumerate(flattened):
-        combined[slug]["previous"] = flattened[i - 1] if i > 0 else None
-        combined[slug]["next"] = flattened[i + 1] if i < (len(flattened) - 1) else None
-        combined[slug]["filepath"] = src_path / REVERSE_FILES.get(
-            slug, Path(slug) / "index.md"
-        )
 
-    return combined
+def load_project(src_path, home_page):
+    """Load the book's structure from its home page, parsing it once per change."""
+    key = (Path(src_path).resolve(), Path(home_page))
+    stamp = _project_stamp(src_path, home_page)
+    project = _PROJECTS.get(key)
+    if (project is None) or (project["stamp"] != stamp):
+        project = _read_project(src_path, home_page, stamp)
+        _PROJECTS[key] = project
+    return project
+
+
+def load_references(text):
+    """Parse Markdown link reference definitions into {id: (url, title)}."""
+    converter = _get_converter()
+    converter.reset()
+    converter.treeprocessors[_REFERENCES].references = {}
+    converter.convert(text)
+    return dict(converter.references)
 
 
 def load_slides(src_path):
     """Load slides entries from home page. Returns [] if no div#slides present."""
-    md = (src_path / HOME_PAGE).read_text(encoding="utf-8")
-    html = markdown(md, extensions=MARKDOWN_EXTENSIONS)
-    doc = BeautifulSoup(html, "html.parser")
-    divs = doc.select("div#slides")
-    if not divs:
-        return []
-    return [
-        {"href": node["href"], "title": node.decode_contents()}
-        for node in divs[0].select("a[href]")
-    ]
+    return load_project(src_path, HOME_PAGE)["slides"]
+
+
+def make_soup(text, parser=HTML_PARSER):
+    """Parse HTML with the chosen parser."""
+    return BeautifulSoup(text, parser)
+
+
+def markdown_to_html(text, references=None):
+    """Convert Markdown to HTML, reusing this thread's converter.
+
+    references maps link IDs to (url, title) as made by load_references.
+    Like definitions at the end of the text, they replace the text's own.
+    """
+    converter = _get_converter()
+    converter.reset()
+    converter.treeprocessors[_REFERENCES].references = references or {}
+    return converter.convert(text)
+
+
+def project_glossary(project, parser=HTML_PARSER):
+    """Load the glossary for a project the first time it is needed."""
+    if parser not in project["glossaries"]:
+        project["glossaries"][parser] = load_glossary(project["src"], parser)
+    return project["glossaries"][parser]
+
+
+def refresh_files(files):
+    """Forget cached files whose modification time or size has changed."""
+    for path, entry in list(files.items()):
+        if _file_stamp(path) != entry["stamp"]:
+            del files[path]
+
+
+def select_nodes(doc, nodes, selector):
+    """Get nodes from a collected walk if there is one, or select them."""
+    return doc.select(selector) if nodes is None else nodes[selector]
 
 
 def slides_src_file(src_path, href):
@@ -81,6 +244,61 @@ def warn(message):
     print(message, file=sys.stderr)
 
 
+def write_if_changed(path, text):
+    """Replace a file's contents in one step if they differ, returning True if so."""
+    data = text.encode("utf-8")
+    try:
+        if (path.stat().st_size == len(data)) and (path.read_bytes() == data):
+            return False
+    except OSError:
+        pass
+    temp_path = path.with_name(f"{path.name}.{os.getpid()}")
+    temp_path.write_bytes(data)
+    os.replace(temp_path, path)
+    return True
+
+
+class _AddReferences(Treeprocessor):
+    """Add site-wide link references to those defined in the document."""
+
+    def __init__(self, md=None):
+        super().__init__(md)
+        self.references = {}
+
+    def run(self, root):
+        self.md.references.update(self.references)
+
+
+def _cache_entry(files, path):
+    """Find or make the cache entry for a file, checking its status once."""
+    entry = files.get(path)
+    if entry is None:
+        entry = {"stamp": _file_stamp(path), "values": {}}
+        files[path] = entry
+    return entry
+
+
+def _file_stamp(path):
+    """Identify a version of a file by modification time and size (None if missing)."""
+    try:
+        info = Path(path).stat()
+    except OSError:
+        return None
+    return (info.st_mtime_ns, info.st_size)
+
+
+def _get_converter():
+    """Get this thread's Markdown converter, making it the first time."""
+    converter = getattr(_CONVERTERS, "markdown", None)
+    if converter is None:
+        converter = Markdown(extensions=MARKDOWN_EXTENSIONS)
+        converter.treeprocessors.register(
+            _AddReferences(converter), _REFERENCES, _REFERENCES_PRIORITY
+        )
+        _CONVERTERS.markdown = converter
+    return converter
+
+
 def _get_slug_from_link(raw):
     """Convert '@/something/' to 'something'."""
     assert raw.startswith("@/") and raw.endswith("/")
@@ -89,12 +307,73 @@ def _get_slug_from_link(raw):
 
 def _load_order_section(doc, selector, labeller):
     """Load a section of the table of contents from README.md DOM."""
-    div = f"div#{selector}"
+    divs = doc.select(f"div#{selector}")
+    if not divs:
+        return {}
     return {
         _get_slug_from_link(node["href"]): {
             "number": labeller(i),
             "kind": selector,
             "title": node.decode_contents(),
         }
-        for i, node in enumerate(doc.select(div)[0].select("a[href]"))
+        for i, node in enumerate(divs[0].select("a[href]"))
+    }
+
+
+def _load_slides_section(doc, src_path):
+    """Load slides entries from README.md DOM."""
+    divs = doc.select("div#slides")
+    if not divs:
+        return []
+    return [
+        {
+            "href": node["href"],
+            "title": node.decode_contents(),
+            "src_file": slides_src_file(src_path, node["href"]),
+        }
+        for node in divs[0].select("a[href]")
+    ]
+
+
+def _project_stamp(src_path, home_page):
+    """Identify the versions of the files a project model is built from."""
+    return tuple(
+        _file_stamp(path)
+        for path in (
+            src_path / home_page,
+            src_path / LINKS_PATH,
+            src_path / GLOSSARY_PATH,
+        )
+    )
+
+
+def _read_project(src_path, home_page, stamp):
+    """Parse the home page and build a project model from it."""
+    md = (src_path / home_page).read_text(encoding="utf-8")
+    html = markdown_to_html(md)
+    doc = make_soup(html)
+
+    lessons = _load_order_section(doc, "lessons", lambda i: str(i + 1))
+    appendices = _load_order_section(doc, "appendices", lambda i: chr(ord("A") + i))
+    order = {**lessons, **appendices}
+    flattened = list(order.keys())
+    for i, slug in enumerate(flattened):
+        order[slug]["previous"] = flattened[i - 1] if i > 0 else None
+        order[slug]["next"] = flattened[i + 1] if i < (len(flattened) - 1) else None
+        order[slug]["filepath"] = src_path / REVERSE_FILES.get(
+            slug, Path(slug) / "index.md"
+        )
+
+    title = RE_BOOK_TITLE.search(md)
+    repo = RE_BOOK_REPO.search(md)
+    return {
+        "src": src_path,
+        "home_page": home_page,
+        "stamp": stamp,
+        "order": order,
+        "slides": _load_slides_section(doc, src_path),
+        "title": title.group(1).strip() if title else "",
+        "repo": repo.group(1).strip() if repo else "",
+        "links": load_links(src_path),
+        "glossaries": {},
     }
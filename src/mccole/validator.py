@@ -0,0 +1,122 @@
+"""Run the Nu HTML validator as a local server and send it pages over HTTP."""
+
+import json
+from pathlib import Path
+import subprocess
+import time
+import urllib.request
+
+import vnujar
+
+
+# Address the validator listens on (never exposed beyond this machine)
+VALIDATOR_HOST = "127.0.0.1"
+
+# Tiny page sent to check that a server really is the Nu validator
+PROBE_PAGE = b"<!DOCTYPE html><html lang=en><title>probe</title></html>"
+
+# Seconds to wait for an answer to the probe
+PROBE_TIMEOUT = 5.0
+
+# Seconds to wait for a newly-started validator to answer
+START_TIMEOUT = 60.0
+
+# Seconds between checks that a newly-started validator is ready
+START_INTERVAL = 0.25
+
+# Seconds to wait for a validator to stop before killing it
+STOP_TIMEOUT = 5.0
+
+
+def start_validator(port):
+    """Start the validator on localhost and wait until it answers, returning its process."""
+    jar = Path(vnujar.__file__).with_name("vnu.jar")
+    proc = subprocess.Popen(
+        [
+            "java",
+            f"-Dnu.validator.servlet.bind-address={VALIDATOR_HOST}",
+            "-cp",
+            str(jar),
+            "nu.validator.servlet.Main",
+            str(port),
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + START_TIMEOUT
+    while not validator_running(port):
+        if (proc.poll() is not None) or (time.monotonic() > deadline):
+            stop_validator(proc)
+            raise RuntimeError(f"HTML validator did not start on port {port}")
+        time.sleep(START_INTERVAL)
+    return proc
+
+
+def stop_validator(proc):
+    """Stop a validator started by this process."""
+    proc.terminate()
+    try:
+        proc.wait(timeout=STOP_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def validate_page(port, filepath, ignore=()):
+    """Send one page to the validator and return its complaints as lines of text.
+
+    Raises OSError if the validator can't be reached and ValueError if
+    whatever answered isn't the validator.
+    """
+    messages = _post_page(port, Path(filepath).read_bytes())
+    lines = [_format_message(filepath, m) for m in messages if _is_reported(m)]
+    return [line for line in lines if not any(text in line for text in ignore)]
+
+
+def validator_running(port):
+    """Is the Nu validator already answering on this port (e.g., one kept by watch)?"""
+    try:
+        _post_page(port, PROBE_PAGE, timeout=PROBE_TIMEOUT)
+    except (OSError, ValueError):
+        return False
+    return True
+
+
+def _format_message(filepath, message):
+    """Format a message the way the validator's command-line tool does."""
+    kind = message["type"]
+    if message.get("subType"):
+        kind = f"{kind} {message['subType']}"
+    last = message.get("lastLine", message.get("firstLine", 0))
+    first = message.get("firstLine", last)
+    where = (
+        f"{first}.{message.get('firstColumn', message.get('lastColumn', 0))}"
+        f"-{last}.{message.get('lastColumn', 0)}"
+    )
+    text = message.get("message", "").replace("“", '"').replace("”", '"')
+    return f'"{filepath}":{where}: {kind}: {text}'
+
+
+def _is_reported(message):
+    """Report errors and warnings but not informational messages."""
+    return (message.get("type") != "info") or (message.get("subType") == "warning")
+
+
+def _post_page(port, data, timeout=None):
+    """Send a page to the validator and return its list of messages."""
+    request = urllib.request.Request(
+        _validator_url(port),
+        data=data,
+        headers={"Content-Type": "text/html; charset=utf-8"},
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        result = json.load(response)
+    messages = result.get("messages") if isinstance(result, dict) else None
+    if not isinstance(messages, list):
+        raise ValueError(f"no HTML validator on port {port}")
+    return messages
+
+
+def _validator_url(port):
+    """Make the URL that pages are sent to."""
+    return f"http://{VALIDATOR_HOST}:{port}/?out=json"
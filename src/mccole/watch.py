@@ -0,0 +1,125 @@
+"""Watch source files and rebuild affected pages when they change."""
+
+from pathlib import Path
+import time
+
+from .build import build, rebuild
+from .single_page import build_single_page
+from . import util
+from .validator import start_validator, stop_validator, validator_running
+
+
+# Seconds between scans of the source directory
+WATCH_INTERVAL = 1.0
+
+
+def watch(options, config, env, notify=None):
+    """Rebuild the site incrementally until interrupted, calling notify after each rebuild."""
+    server = _start_validator(options)
+    before = _snapshot(config)
+    pending = set()
+    print(f"watching {config['src']} (Ctrl-C to stop)")
+    try:
+        while True:
+            time.sleep(WATCH_INTERVAL)
+            after = _snapshot(config)
+            changed = _changed_files(before, after)
+            before = after
+            if not changed:
+                continue
+            # Files whose rebuild failed (e.g., because they were half-saved)
+            # are tried again along with whatever changes next.
+            pending |= changed
+            try:
+                config, env = _watch_step(options, config, env, pending)
+            except Exception as exc:
+                util.warn(f"rebuild failed: {exc}")
+                continue
+            pending = set()
+            if notify is not None:
+                notify()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if server is not None:
+            stop_validator(server)
+
+
+def _watch_step(options, config, env, changed):
+    """Rebuild for one set of changed files and return the current config and env."""
+    if _needs_full_build(options, config, changed):
+        config, env = build(options, config["output"], config["manifest"])
+        _report(config, ["site"])
+    else:
+        _report(config, rebuild(config, env, changed, options.jobs))
+    if options.single_page:
+        build_single_page(config, env, options.single_page)
+    return config, env
+
+
+def _changed_files(before, after):
+    """Find files that have been created, modified, or deleted between snapshots."""
+    return {
+        path
+        for path in before.keys() | after.keys()
+        if before.get(path) != after.get(path)
+    }
+
+
+def _needs_full_build(options, config, changed):
+    """Do any of the changed files affect every page?"""
+    site_wide = {
+        config["config"],
+        config["src"] / config["home_page"],
+        config["src"] / util.LINKS_PATH,
+        config["src"] / util.GLOSSARY_PATH,
+    }
+    if options.extra:
+        site_wide.add(Path(options.extra))
+    return any(
+        (path in site_wide) or (config["templates"] in path.parents) for path in changed
+    )
+
+
+def _start_validator(options):
+    """Start an HTML validator for check to reuse if asked to and none is running."""
+    if (not options.validator) or validator_running(options.validator_port):
+        return None
+    try:
+        server = start_validator(options.validator_port)
+    except (OSError, RuntimeError) as exc:
+        util.warn(f"unable to start HTML validator: {exc}")
+        return None
+    print(f"HTML validator listening on port {options.validator_port}")
+    return server
+
+
+def _snapshot(config):
+    """Record the modification time of every source file."""
+    result = {}
+    prune = {config["dst"]}
+    skip_names = config["skip_names"]
+    for dirpath, dirs, files in config["src"].walk():
+        dirs[:] = [
+            d
+            for d in dirs
+            if Path(dirpath, d) not in prune
+            and not d.startswith(".")
+            and d not in skip_names
+        ]
+        for fname in files:
+            if fname.startswith(".") or fname in skip_names:
+                continue
+            filepath = Path(dirpath, fname)
+            try:
+                result[filepath] = filepath.stat().st_mtime_ns
+            except FileNotFoundError:
+                continue
+    return result
+
+
+def _report(config, rebuilt):
+    """Show what was rebuilt if requested."""
+    if config["verbose"] > 0:
+        for item in rebuilt:
+            print(f"… {item}")
@@ -99,7 +99,7 @@ def basic_config(src_dir):
         "src": src_dir,
         "dst": src_dir.parent / "docs",
         "home_page": Path("README.md"),
-        "links": util.load_links(src_dir),
+        "references": util.load_references(util.load_links(src_dir)),
         "order": util.load_order(src_dir, Path("README.md")),
         "templates": src_dir.parent / "_templates",
         "repo": "https://github.com/test/repo",
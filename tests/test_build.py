@@ -1,6 +1,7 @@
 """Tests for mccole.build."""
 
 import io
+import os
 from pathlib import Path
 
 import pytest
@@ -8,21 +9,21 @@ from bs4 import BeautifulSoup
 from jinja2 import Environment, FileSystemLoader
 
 import mccole.build as build_mod
+import mccole.manifest as manifest_mod
 import mccole.util as util_mod
 from mccole.build import (
     _build_index_page,
     _build_other,
     _build_page,
     _build_page_fragment,
+    _apply_patchers,
+    _build_pages,
     _collect_figure_numbers,
     _collect_table_numbers,
     _fill_element_numbers,
     _find_files,
     _fragment_patchers,
     _is_interesting_file,
-    _load_book_repo,
-    _load_book_title,
-    _load_glossary,
     _make_context,
     _make_output_path,
     _make_root_prefix,
@@ -40,6 +41,7 @@ from mccole.build import (
     _patch_th_scope,
     _patch_title,
     _render_page,
+    _write_page,
 )
 
 
@@ -88,7 +90,7 @@ def _base_config(tmp_path):
         "dst": dst,
         "home_page": Path("README.md"),
         "order": _base_order(),
-        "links": "",
+        "references": {},
         "glossary": {},
         "slides": [],
         "brand": "Test",
@@ -148,46 +150,6 @@ class TestMakeRootPrefix:
         assert _make_root_prefix(config, path) == "../../"
 
 
-class TestLoadBookTitle:
-    def test_extracts_h1(self, tmp_path):
-        (tmp_path / "README.md").write_text("# My Book\n\nContent.\n", encoding="utf-8")
-        assert _load_book_title(tmp_path, Path("README.md")) == "My Book"
-
-    def test_missing_h1_returns_empty(self, tmp_path):
-        (tmp_path / "README.md").write_text("No heading here.\n", encoding="utf-8")
-        assert _load_book_title(tmp_path, Path("README.md")) == ""
-
-    def test_missing_file_returns_empty(self, tmp_path):
-        assert _load_book_title(tmp_path, Path("MISSING.md")) == ""
-
-
-class TestLoadBookRepo:
-    def test_extracts_repo_link(self, tmp_path):
-        (tmp_path / "README.md").write_text(
-            "[repo]: https://github.com/x/y\n", encoding="utf-8"
-        )
-        assert _load_book_repo(tmp_path, Path("README.md")) == "https://github.com/x/y"
-
-    def test_missing_link_returns_empty(self, tmp_path):
-        (tmp_path / "README.md").write_text("# No repo\n", encoding="utf-8")
-        assert _load_book_repo(tmp_path, Path("README.md")) == ""
-
-    def test_missing_file_returns_empty(self, tmp_path):
-        assert _load_book_repo(tmp_path, Path("MISSING.md")) == ""
-
-
-class TestLoadGlossary:
-    def test_extracts_ids_and_terms(self, tmp_path):
-        gloss_dir = tmp_path / "glossary"
-        gloss_dir.mkdir()
-        (gloss_dir / "index.md").write_text(
-            "<span id=\"term1\">Term One</span>\n:   Definition.\n",
-            encoding="utf-8",
-        )
-        result = _load_glossary(tmp_path)
-        assert result == {"term1": "Term One"}
-
-
 class TestMakeOutputPath:
     def test_regular_file(self, tmp_path):
         config = {
@@ -224,6 +186,43 @@ class TestMakeOutputPath:
         assert result == tmp_path / "docs" / "index.html"
 
 
+class TestMakeEnvironment:
+    def _config(self, tmp_path, output=None):
+        tmpl_dir = tmp_path / "_templates"
+        tmpl_dir.mkdir(exist_ok=True)
+        (tmpl_dir / "page.html").write_text("<p>{{ content }}</p>", encoding="utf-8")
+        return {"templates": tmpl_dir, "dst": tmp_path / "docs", "output": output}
+
+    def test_shared_within_process(self, tmp_path):
+        config = self._config(tmp_path)
+        assert build_mod._make_environment(config) is build_mod._make_environment(
+            {**config}
+        )
+
+    def test_compiled_templates_cached_on_disk(self, tmp_path):
+        config = self._config(tmp_path)
+        env = build_mod._make_environment(config)
+        assert env.get_template("page.html").render(content="x") == "<p>x</p>"
+        cache_dir = config["dst"] / build_mod.TEMPLATE_CACHE_DIR
+        assert len(list(cache_dir.iterdir())) == 1
+
+    def test_changed_template_recompiled(self, tmp_path, monkeypatch):
+        config = self._config(tmp_path)
+        build_mod._make_environment(config).get_template("page.html")
+        monkeypatch.setattr(build_mod, "_ENVIRONMENTS", {})
+        (config["templates"] / "page.html").write_text(
+            "<div>{{ content }}</div>", encoding="utf-8"
+        )
+        env = build_mod._make_environment(config)
+        assert env.get_template("page.html").render(content="x") == "<div>x</div>"
+
+    def test_no_cache_when_building_into_memory(self, tmp_path):
+        config = self._config(tmp_path, output={})
+        env = build_mod._make_environment(config)
+        assert env.bytecode_cache is None
+        assert not config["dst"].exists()
+
+
 class TestMakeContext:
     def test_with_slug(self, tmp_path):
         config = {
@@ -259,6 +258,54 @@ class TestMakeContext:
         assert ctx["next"] == (None, None)
 
 
+class TestMakeSiteContext:
+    def _env(self, tmp_path):
+        tmpl_dir = tmp_path / "_templates"
+        tmpl_dir.mkdir(exist_ok=True)
+        data = Path(build_mod.__file__).parent / "data" / "_templates"
+        for name in ("nav.html", "page.html"):
+            (tmpl_dir / name).write_text(
+                (data / name).read_text(encoding="utf-8"), encoding="utf-8"
+            )
+        return Environment(loader=FileSystemLoader(tmpl_dir))
+
+    def test_lists_without_templates(self, tmp_path):
+        site = build_mod._make_site_context(_base_config(tmp_path))
+        assert site["lessons"] == [("intro", "Intro")]
+        assert site["appendices"] == [("refs", "Refs")]
+        assert site["nav"] is None
+
+    def test_no_nav_template(self, tmp_path, page_env):
+        site = build_mod._make_site_context(_base_config(tmp_path), page_env)
+        assert site["nav"] is None
+
+    @pytest.mark.parametrize("slug", [None, "intro", "refs"])
+    def test_prerendered_nav_same_as_rendering_each_page(self, tmp_path, slug):
+        config = _base_config(tmp_path)
+        env = self._env(tmp_path)
+        config["site_context"] = build_mod._make_site_context(config, env)
+        context = _make_context(config, slug)
+        expected = env.get_template("nav.html").render(
+            current_slug=slug,
+            **{k: context[k] for k in ("lessons", "appendices", "slides")},
+        )
+        assert context["nav"] == expected
+        page = env.get_template("page.html").render(content="", **context)
+        assert page.count('class="active"') == (0 if slug is None else 1)
+
+    def test_context_uses_precomputed_lists(self, tmp_path):
+        config = _base_config(tmp_path)
+        config["site_context"] = {
+            "lessons": ["sentinel"],
+            "appendices": [],
+            "slides": [],
+            "nav": None,
+        }
+        ctx = _make_context(config, "intro")
+        assert ctx["lessons"] == ["sentinel"]
+        assert "nav" not in ctx
+
+
 class TestFragmentAndPagePatchers:
     def test_fragment_patchers_returns_list(self):
         result = _fragment_patchers()
@@ -271,6 +318,43 @@ class TestFragmentAndPagePatchers:
         assert len(result) > 0
 
 
+_PATCH_HTML = (
+    "<html><head><title>Old</title><link href=\"@/s.css\"></head><body>"
+    "<h1>Chapter</h1><p id=\"terms\"></p>"
+    "<a href=\"g:key\">k</a> <a href=\"b:ref\"></a> <a href=\"@/other/\">o</a>"
+    "<figure id=\"f:one\"><figcaption>cap</figcaption></figure>"
+    "<a href=\"#f:one\"></a> <a href=\"#t:one\"></a>"
+    "<div id=\"t:one\" data-caption=\"tab\" markdown=\"1\"><table>"
+    "<thead><tr><th>h</th></tr></thead><tbody><tr><th>r</th></tr></tbody>"
+    "</table></div>"
+    "<div data-inc=\"x.py\"></div>"
+    "<pre><code class=\"language-py\">x = 1</code></pre>"
+    "<section class=\"exercises\"></section>"
+    "</body></html>"
+)
+
+
+class TestApplyPatchers:
+    @pytest.mark.parametrize("patchers", [_page_patchers, _fragment_patchers])
+    def test_same_as_patching_one_at_a_time(self, tmp_path, patchers):
+        """A single walk produces the same page as running patchers in turn."""
+        config = _base_config(tmp_path)
+        config["glossary"] = {"key": "Key"}
+        (config["src"] / "ch").mkdir()
+        src_path = config["src"] / "ch" / "index.md"
+        (config["src"] / "ch" / "x.py").write_text("x = 1\n", encoding="utf-8")
+        dst_path = config["dst"] / "ch" / "index.html"
+
+        expected = _soup(_PATCH_HTML)
+        for func in patchers():
+            func(config, src_path, dst_path, expected)
+        actual = _soup(_PATCH_HTML)
+        _apply_patchers(config, src_path, dst_path, actual, patchers())
+
+        assert str(actual) == str(expected)
+        assert "codehilite" in str(actual)
+
+
 class TestCollectFigureNumbers:
     def test_numbers_figure_and_updates_caption(self, tmp_path):
         doc = _soup(
@@ -376,6 +460,62 @@ class TestBuildOther:
         _build_other(config, f)
         assert (dst / "style.css").read_text(encoding="utf-8") == "body {}\n"
 
+    def _setup(self, tmp_path, link=False):
+        src = tmp_path / "src"
+        dst = tmp_path / "docs"
+        src.mkdir()
+        dst.mkdir()
+        config = {
+            "src": src,
+            "dst": dst,
+            "home_page": Path("README.md"),
+            "link_files": link,
+        }
+        return config, src, dst
+
+    def test_unchanged_file_not_copied_again(self, tmp_path):
+        config, src, dst = self._setup(tmp_path)
+        f = src / "data.csv"
+        f.write_text("a,b\n", encoding="utf-8")
+        _build_other(config, f)
+        assert (dst / "data.csv").stat().st_mtime_ns == f.stat().st_mtime_ns
+        (dst / "data.csv").write_text("x,y\n", encoding="utf-8")
+        os.utime(dst / "data.csv", ns=(f.stat().st_atime_ns, f.stat().st_mtime_ns))
+        _build_other(config, f)
+        assert (dst / "data.csv").read_text(encoding="utf-8") == "x,y\n"
+        _build_other(config, f, force=True)
+        assert (dst / "data.csv").read_text(encoding="utf-8") == "a,b\n"
+
+    def test_changed_file_copied(self, tmp_path):
+        config, src, dst = self._setup(tmp_path)
+        f = src / "data.csv"
+        f.write_text("a,b\n", encoding="utf-8")
+        _build_other(config, f)
+        f.write_text("a,b,c\n", encoding="utf-8")
+        _build_other(config, f)
+        assert (dst / "data.csv").read_text(encoding="utf-8") == "a,b,c\n"
+
+    def test_hard_link(self, tmp_path):
+        config, src, dst = self._setup(tmp_path, link=True)
+        f = src / "image.png"
+        f.write_bytes(b"\x89PNG")
+        (dst / "image.png").write_bytes(b"old")
+        _build_other(config, f)
+        assert (dst / "image.png").samefile(f)
+
+    def test_copies_many_files(self, tmp_path):
+        config, src, dst = self._setup(tmp_path)
+        files = set()
+        for i in range(20):
+            f = src / f"sub{i % 3}" / f"file{i}.txt"
+            f.parent.mkdir(exist_ok=True)
+            f.write_text(f"{i}\n", encoding="utf-8")
+            files.add(f)
+        build_mod._build_others(config, files)
+        for i in range(20):
+            path = dst / f"sub{i % 3}" / f"file{i}.txt"
+            assert path.read_text(encoding="utf-8") == f"{i}\n"
+
 
 class TestPatchMarkdownAttribute:
     def test_removes_markdown_attribute(self):
@@ -613,6 +753,35 @@ class TestRenderPage:
         assert "<p>Hello</p>" in dst_path.read_text(encoding="utf-8")
 
 
+class TestWritePage:
+    def test_unchanged_page_not_rewritten(self, tmp_path, page_config):
+        dst_path = tmp_path / "page.html"
+        _write_page(page_config, dst_path, "<p>same</p>")
+        os.utime(dst_path, ns=(0, 0))
+        _write_page(page_config, dst_path, "<p>same</p>")
+        assert dst_path.stat().st_mtime_ns == 0
+        assert page_config["written"] == {
+            "changed": [dst_path],
+            "unchanged": [dst_path],
+        }
+
+    def test_changed_page_replaced(self, tmp_path, page_config):
+        dst_path = tmp_path / "page.html"
+        _write_page(page_config, dst_path, "<p>old</p>")
+        _write_page(page_config, dst_path, "<p>new</p>")
+        assert dst_path.read_text(encoding="utf-8") == "<p>new</p>"
+        assert page_config["written"]["changed"] == [dst_path, dst_path]
+        assert list(tmp_path.glob("page.html*")) == [dst_path]
+
+    def test_in_memory_changes_recorded(self, tmp_path, page_config):
+        page_config["output"] = {}
+        dst_path = tmp_path / "page.html"
+        _write_page(page_config, dst_path, "<p>same</p>")
+        _write_page(page_config, dst_path, "<p>same</p>")
+        assert page_config["output"] == {dst_path: "<p>same</p>"}
+        assert page_config["written"]["unchanged"] == [dst_path]
+
+
 class TestBuildPageFragment:
     def test_returns_metadata_path_doc(self, tmp_path, page_env, page_config):
         metadata, dst_path, doc = _build_page_fragment(
@@ -637,6 +806,18 @@ class TestBuildPage:
         dst_path = page_config["dst"] / "intro" / "index.html"
         assert dst_path.exists()
 
+    def test_resolves_site_wide_links(self, tmp_path, page_env, page_config):
+        src_path = page_config["src"] / "intro" / "index.md"
+        src_path.write_text("# Intro\n\nSee [the site][site].\n", encoding="utf-8")
+        page_config["references"] = util_mod.load_references(
+            "[site]: https://example.com/\n"
+        )
+        _build_page(page_config, page_env, "intro", src_path)
+        html = (page_config["dst"] / "intro" / "index.html").read_text(
+            encoding="utf-8"
+        )
+        assert '<a href="https://example.com/">the site</a>' in html
+
 
 class TestBuildIndexPage:
     def test_writes_index_html(self, tmp_path, page_env, page_config):
@@ -657,3 +838,224 @@ class TestBuildIndexPage:
         _build_index_page(page_config, page_env, entries)
         dst_path = page_config["dst"] / "index" / "index.html"
         assert dst_path.exists()
+
+
+class TestBuildPages:
+    def _tracking(self, previous=None):
+        current = manifest_mod.empty_manifest()
+        current["global"] = "g"
+        if previous is None:
+            previous = manifest_mod.empty_manifest()
+        return previous, current
+
+    def _jobs(self, page_config):
+        return [
+            build_mod._page_job("intro", page_config["src"] / "intro" / "index.md"),
+        ]
+
+    def test_builds_new_page_and_records_entry(self, tmp_path, page_env, page_config):
+        tracking = self._tracking()
+        _build_pages(page_config, page_env, tracking, self._jobs(page_config))
+        assert (page_config["dst"] / "intro" / "index.html").exists()
+        assert "intro/index.md" in tracking[1]["pages"]
+
+    def test_skips_unchanged_page(self, tmp_path, page_env, page_config):
+        _, first = self._tracking()
+        _build_pages(
+            page_config,
+            page_env,
+            (manifest_mod.empty_manifest(), first),
+            self._jobs(page_config),
+        )
+        dst_path = page_config["dst"] / "intro" / "index.html"
+        dst_path.write_text("sentinel", encoding="utf-8")
+
+        _build_pages(
+            page_config, page_env, self._tracking(first), self._jobs(page_config)
+        )
+        assert dst_path.read_text(encoding="utf-8") == "sentinel"
+
+    def test_rebuilds_changed_page(self, tmp_path, page_env, page_config):
+        _, first = self._tracking()
+        _build_pages(
+            page_config,
+            page_env,
+            (manifest_mod.empty_manifest(), first),
+            self._jobs(page_config),
+        )
+        dst_path = page_config["dst"] / "intro" / "index.html"
+        dst_path.write_text("sentinel", encoding="utf-8")
+
+        src_path = page_config["src"] / "intro" / "index.md"
+        src_path.write_text("# Intro\n\nChanged.\n", encoding="utf-8")
+        _build_pages(
+            page_config, page_env, self._tracking(first), self._jobs(page_config)
+        )
+        assert "Changed." in dst_path.read_text(encoding="utf-8")
+
+    def test_reuses_index_entries_of_skipped_page(
+        self, tmp_path, page_env, page_config
+    ):
+        src_path = page_config["src"] / "intro" / "index.md"
+        src_path.write_text('# Intro\n\n[%i "key" %]\n', encoding="utf-8")
+        _, first = self._tracking()
+        _build_pages(
+            page_config,
+            page_env,
+            (manifest_mod.empty_manifest(), first),
+            self._jobs(page_config),
+        )
+        _, second = self._tracking()
+        _build_pages(page_config, page_env, (first, second), self._jobs(page_config))
+        entries = second["pages"]["intro/index.md"]["ix_entries"]
+        assert entries == first["pages"]["intro/index.md"]["ix_entries"]
+        assert len(entries) == 1
+
+    def test_parallel_matches_serial(self, tmp_path, page_env, page_config):
+        jobs = []
+        for i in range(3):
+            src_path = page_config["src"] / f"ch{i}" / "index.md"
+            src_path.parent.mkdir()
+            src_path.write_text(f'# Ch {i}\n\n[%i "k{i}" %]\n', encoding="utf-8")
+            jobs.append(build_mod._page_job(None, src_path))
+        _, serial = self._tracking()
+        _build_pages(
+            page_config, page_env, (manifest_mod.empty_manifest(), serial), jobs
+        )
+        _, parallel = self._tracking()
+        _build_pages(
+            page_config, page_env, (manifest_mod.empty_manifest(), parallel), jobs, 2
+        )
+        assert parallel["pages"] == serial["pages"]
+        assert parallel["pages"]["ch1/index.md"]["ix_entries"][0]["key"] == "k1"
+
+    def test_profile_records_stages(self, tmp_path, page_env, page_config):
+        page_config["timings"] = {}
+        _build_pages(page_config, page_env, self._tracking(), self._jobs(page_config))
+        stages = page_config["timings"]["intro/index.md"]
+        for name in ["frontmatter", "shortcodes", "markdown", "render", "parse"]:
+            assert stages[name]["calls"] == 1
+        for func in build_mod._page_patchers():
+            assert stages[func.__name__.lstrip("_")]["calls"] == 1
+        assert stages["write"]["calls"] == 1
+
+    def test_profile_collected_from_workers(self, tmp_path, page_env, page_config):
+        page_config["timings"] = {}
+        jobs = []
+        for i in range(2):
+            src_path = page_config["src"] / f"ch{i}" / "index.md"
+            src_path.parent.mkdir()
+            src_path.write_text(f"# Ch {i}\n", encoding="utf-8")
+            jobs.append(build_mod._page_job(None, src_path))
+        _build_pages(page_config, page_env, self._tracking(), jobs, 2)
+        assert set(page_config["timings"]) == {"ch0/index.md", "ch1/index.md"}
+        assert page_config["timings"]["ch1/index.md"]["markdown"]["calls"] == 1
+
+
+class TestBuildIndex:
+    def test_only_indexed_pages_contribute_entries(
+        self, tmp_path, page_env, page_config
+    ):
+        idx_src = page_config["src"] / "index" / "index.md"
+        idx_src.parent.mkdir()
+        idx_src.write_text("# Index\n", encoding="utf-8")
+        page_config["order"]["index"] = {
+            "number": "",
+            "kind": "appendices",
+            "title": "Index",
+            "previous": None,
+            "next": None,
+            "filepath": idx_src,
+        }
+        intro = page_config["src"] / "intro" / "index.md"
+        intro.write_text('# Intro\n\n[%i "alpha" %]\n', encoding="utf-8")
+        slides = page_config["src"] / "intro" / "slides.md"
+        slides.write_text('# Slides\n\n[%i "beta" %]\n', encoding="utf-8")
+        jobs = [
+            build_mod._page_job("intro", intro),
+            build_mod._page_job(None, slides, indexed=False),
+        ]
+        tracking = (manifest_mod.empty_manifest(), manifest_mod.empty_manifest())
+        _build_pages(page_config, page_env, tracking, jobs)
+        build_mod._build_index(page_config, page_env, tracking, {"index"}, jobs)
+        html = (page_config["dst"] / "index" / "index.html").read_text(encoding="utf-8")
+        assert "alpha" in html
+        assert "beta" not in html
+
+
+class TestPageJobs:
+    def test_jobs_follow_book_order(self, tmp_path, page_config):
+        order = page_config["order"]
+        page_config["order"] = {"refs": order["refs"], "intro": order["intro"]}
+        jobs = build_mod._page_jobs(page_config, {"intro", "refs"})
+        assert [job["slug"] for job in jobs] == [None, "refs", "intro"]
+
+
+class TestRebuild:
+    def _build_once(self, page_config, page_env):
+        refs = page_config["order"]["refs"]["filepath"]
+        refs.parent.mkdir()
+        refs.write_text("# Refs\n", encoding="utf-8")
+        (page_config["src"] / "README.md").write_text("# Home\n", encoding="utf-8")
+        page_config["config"].write_text("[tool]\n", encoding="utf-8")
+        jobs = build_mod._page_jobs(page_config, set(page_config["order"]))
+        tracking = (manifest_mod.empty_manifest(), manifest_mod.empty_manifest())
+        _build_pages(page_config, page_env, tracking, jobs)
+        page_config["manifest"] = tracking[1]
+
+    def test_rebuilds_page_that_includes_changed_file(
+        self, tmp_path, page_env, page_config
+    ):
+        src_path = page_config["order"]["intro"]["filepath"]
+        src_path.write_text("# Intro\n\n[%inc a.py %]\n", encoding="utf-8")
+        (src_path.parent / "a.py").write_text("x = 1\n", encoding="utf-8")
+        self._build_once(page_config, page_env)
+
+        (src_path.parent / "a.py").write_text("x = 2\n", encoding="utf-8")
+        rebuilt = build_mod.rebuild(page_config, page_env, {src_path.parent / "a.py"})
+        assert rebuilt == [src_path]
+
+    def test_ignores_unrelated_file(self, tmp_path, page_env, page_config):
+        src_path = page_config["order"]["intro"]["filepath"]
+        other = page_config["src"] / "other.txt"
+        other.write_text("text\n", encoding="utf-8")
+        self._build_once(page_config, page_env)
+
+        other.write_text("changed\n", encoding="utf-8")
+        rebuilt = build_mod.rebuild(page_config, page_env, {other})
+        assert src_path not in rebuilt
+        assert (page_config["dst"] / "other.txt").read_text(
+            encoding="utf-8"
+        ) == "changed\n"
+
+
+class TestBuildIntoMemory:
+    def test_page_stored_not_written(self, tmp_path, page_env, page_config):
+        output = {}
+        page_config["output"] = output
+        page_config["dst"] = tmp_path / "memory"
+        _build_page(
+            page_config,
+            page_env,
+            "intro",
+            page_config["src"] / "intro" / "index.md",
+        )
+        dst_path = page_config["dst"] / "intro" / "index.html"
+        assert "Hello." in output[dst_path]
+        assert not page_config["dst"].exists()
+
+    def test_other_file_recorded_by_source_path(self, tmp_path):
+        src = tmp_path / "src"
+        src.mkdir()
+        f = src / "style.css"
+        f.write_text("body {}\n", encoding="utf-8")
+        output = {}
+        config = {
+            "src": src,
+            "dst": tmp_path / "docs",
+            "home_page": Path("README.md"),
+            "output": output,
+        }
+        _build_other(config, f)
+        assert output == {tmp_path / "docs" / "style.css": f}
+        assert not (tmp_path / "docs").exists()
@@ -1,5 +1,6 @@
 """Tests for mccole.check."""
 
+from argparse import Namespace
 import io
 from pathlib import Path
 
@@ -7,6 +8,8 @@ from bs4 import BeautifulSoup
 
 import mccole.check as check_mod
 from mccole.check import (
+    DIV_IN_SUMMARY,
+    _check_all_html,
     _check_bibliography_alphabetical,
     _check_bibliography_bare_isbns,
     _check_bibliography_key_mismatch,
@@ -16,11 +19,16 @@ from mccole.check import (
     _check_glossary_alphabetical,
     _check_glossary_redefinitions,
     _check_lesson_crossrefs,
+    _check_page,
+    _check_page_file,
+    _check_pages_in_workers,
     _check_single_h1,
     _check_table_structure,
     _check_tabs_in_markdown,
     _check_unknown_links,
     _check_unused_crossref_definitions,
+    _index_links,
+    _page_links,
 )
 
 
@@ -52,6 +60,13 @@ def _gloss_page(*pairs):
     return _soup(f"<dl>{items}</dl>")
 
 
+def _links(pages):
+    """Index the links on pages the way check does."""
+    return _index_links(
+        {path: {"links": _page_links(doc)} for path, doc in pages.items()}
+    )
+
+
 def _capture(func, *args, **kwargs):
     """Call func capturing stderr; return (result, stderr_text)."""
     buf = io.StringIO()
@@ -73,7 +88,9 @@ class TestCheckCrossReferences:
                 '<a href="/bibliography/#Key2020">Key2020</a>'
             ),
         }
-        _, err = _capture(_check_cross_references, opts, pages, "bibliography")
+        _, err = _capture(
+            _check_cross_references, opts, pages, _links(pages), "bibliography"
+        )
         assert "unknown" not in err
 
     def test_unknown_key_reported(self, tmp_path):
@@ -84,12 +101,14 @@ class TestCheckCrossReferences:
                 '<a href="/bibliography/#Missing">Missing</a>'
             ),
         }
-        _, err = _capture(_check_cross_references, opts, pages, "bibliography")
+        _, err = _capture(
+            _check_cross_references, opts, pages, _links(pages), "bibliography"
+        )
         assert "unknown bibliography key Missing" in err
 
     def test_missing_definition_page_reported(self, tmp_path):
         opts = _Opts(dst=tmp_path)
-        _, err = _capture(_check_cross_references, opts, {}, "bibliography")
+        _, err = _capture(_check_cross_references, opts, {}, _links({}), "bibliography")
         assert "not found" in err
 
 
@@ -102,7 +121,13 @@ class TestCheckUnusedCrossrefDefinitions:
                 '<a href="/bibliography/#Key2020">Key2020</a>'
             ),
         }
-        _, err = _capture(_check_unused_crossref_definitions, opts, pages, "bibliography")
+        _, err = _capture(
+            _check_unused_crossref_definitions,
+            opts,
+            pages,
+            _links(pages),
+            "bibliography",
+        )
         assert "unused" not in err
 
     def test_unused_key_reported(self, tmp_path):
@@ -110,7 +135,13 @@ class TestCheckUnusedCrossrefDefinitions:
         pages = {
             tmp_path / "bibliography" / "index.html": _bib_page("Key2020"),
         }
-        _, err = _capture(_check_unused_crossref_definitions, opts, pages, "bibliography")
+        _, err = _capture(
+            _check_unused_crossref_definitions,
+            opts,
+            pages,
+            _links(pages),
+            "bibliography",
+        )
         assert "unused bibliography key Key2020" in err
 
 
@@ -121,7 +152,7 @@ class TestCheckGlossaryRedefinitions:
                 '<a href="/glossary/#t1" class="gl-ref">t1</a>'
             ),
         }
-        _, err = _capture(_check_glossary_redefinitions, pages)
+        _, err = _capture(_check_glossary_redefinitions, _links(pages))
         assert "defined in" not in err
 
     def test_term_defined_links_excluded(self, tmp_path):
@@ -134,7 +165,7 @@ class TestCheckGlossaryRedefinitions:
                 '<a href="/glossary/#t1" class="term-defined">t1</a>'
             ),
         }
-        _, err = _capture(_check_glossary_redefinitions, pages)
+        _, err = _capture(_check_glossary_redefinitions, _links(pages))
         assert "defined in" not in err
 
     def test_multiple_page_references_reported(self, tmp_path):
@@ -146,7 +177,7 @@ class TestCheckGlossaryRedefinitions:
                 '<a href="/glossary/#t1" class="gl-ref">t1</a>'
             ),
         }
-        _, err = _capture(_check_glossary_redefinitions, pages)
+        _, err = _capture(_check_glossary_redefinitions, _links(pages))
         assert "glossary entry 't1' defined in" in err
 
 
@@ -416,3 +447,129 @@ class TestCheckTableStructure:
         )
         _, err = _capture(_check_table_structure, opts, Path("test.html"), doc)
         assert "badly-formatted" in err
+
+
+class TestCheckPage:
+    def test_messages_kept_per_check(self):
+        doc = _soup('<p>[link][ref]</p><a href="/glossary/#t1" class="gl-ref">t</a>')
+        result, err = _capture(_check_page, _Opts(), Path("test.html"), doc)
+        assert err == ""
+        assert "0 H1" in result["messages"]["_check_single_h1"]
+        assert "unresolved" in result["messages"]["_check_unknown_links"]
+        assert result["messages"]["_check_figure_structure"] == ""
+
+    def test_definition_links_extracted(self):
+        doc = _soup(
+            '<a href="/glossary/#t1" class="gl-ref">t1</a><a>none</a>'
+            '<a href="../other/">other</a><a href="/bibliography/#K">K</a>'
+        )
+        result = _check_page(_Opts(), Path("test.html"), doc)
+        assert result["links"] == [
+            ("glossary", "/glossary/#t1", ("gl-ref",)),
+            ("bibliography", "/bibliography/#K", ()),
+        ]
+
+
+class TestCheckPageFile:
+    def test_same_results_as_parsed_page(self, tmp_path):
+        path = tmp_path / "index.html"
+        path.write_text('<h1>A</h1><a href="/glossary/#t">t</a>', encoding="utf-8")
+        doc = _soup(path.read_text(encoding="utf-8"))
+        expected = _check_page(_Opts(), path, doc)
+        assert _check_page_file(_Opts(), path, "html.parser") == expected
+
+
+class TestCheckPagesInWorkers:
+    def test_same_results_as_serial(self, tmp_path):
+        paths = []
+        pages = ["<h1>A</h1>", "<p>[x][y]</p>", "<h1>B</h1><h1>C</h1>"]
+        for i, html in enumerate(pages):
+            path = tmp_path / f"p{i}" / "index.html"
+            path.parent.mkdir()
+            path.write_text(html, encoding="utf-8")
+            paths.append(path)
+        results = _check_pages_in_workers(_Opts(), paths, "html.parser", 2)
+        assert list(results) == paths
+        for path in paths:
+            doc = _soup(path.read_text(encoding="utf-8"))
+            assert results[path] == _check_page(_Opts(), path, doc)
+
+
+class TestIndexLinks:
+    def test_links_grouped_by_kind_in_page_order(self):
+        results = {
+            Path("a.html"): {"links": [("glossary", "/glossary/#t1", ())]},
+            Path("b.html"): {
+                "links": [
+                    ("bibliography", "/bibliography/#K", ()),
+                    ("glossary", "/glossary/#t2", ("term-defined",)),
+                ]
+            },
+        }
+        assert _index_links(results) == {
+            "bibliography": [(Path("b.html"), "/bibliography/#K", ())],
+            "glossary": [
+                (Path("a.html"), "/glossary/#t1", ()),
+                (Path("b.html"), "/glossary/#t2", ("term-defined",)),
+            ],
+        }
+
+
+class TestCheckAllHtml:
+    def _options(self, relaxed=False):
+        return Namespace(relaxed=relaxed, validator_port=8788, jobs=2)
+
+    def test_running_validator_reused(self, monkeypatch, capsys):
+        sent = []
+
+        def fake_validate(port, filepath, ignore=()):
+            sent.append((port, filepath, ignore))
+            return [f"{filepath}: problem"]
+
+        def fail_start(port):
+            raise AssertionError("validator should not be started")
+
+        monkeypatch.setattr(check_mod.validator, "validator_running", lambda port: True)
+        monkeypatch.setattr(check_mod.validator, "start_validator", fail_start)
+        monkeypatch.setattr(check_mod.validator, "validate_page", fake_validate)
+        paths = [Path("a.html"), Path("b.html")]
+        _check_all_html(self._options(relaxed=True), paths)
+        assert capsys.readouterr().out == "a.html: problem\nb.html: problem\n"
+        assert sorted(sent) == [(8788, p, [DIV_IN_SUMMARY]) for p in paths]
+
+    def test_started_validator_stopped(self, monkeypatch):
+        stopped = []
+        monkeypatch.setattr(
+            check_mod.validator, "validator_running", lambda port: False
+        )
+        monkeypatch.setattr(check_mod.validator, "start_validator", lambda port: "proc")
+        monkeypatch.setattr(check_mod.validator, "stop_validator", stopped.append)
+        monkeypatch.setattr(
+            check_mod.validator, "validate_page", lambda port, fp, ignore=(): []
+        )
+        _check_all_html(self._options(), [Path("a.html")])
+        assert stopped == ["proc"]
+
+    def test_warns_if_validator_cannot_start(self, monkeypatch, capsys):
+        def missing_java(port):
+            raise FileNotFoundError("java")
+
+        monkeypatch.setattr(
+            check_mod.validator, "validator_running", lambda port: False
+        )
+        monkeypatch.setattr(check_mod.validator, "start_validator", missing_java)
+        _check_all_html(self._options(), [Path("a.html")])
+        assert "unable to validate HTML" in capsys.readouterr().err
+
+    def test_page_errors_reported_and_others_validated(self, monkeypatch, capsys):
+        def fake_validate(port, filepath, ignore=()):
+            if filepath.name == "a.html":
+                raise ValueError("no HTML validator on port 8788")
+            return [f"{filepath}: problem"]
+
+        monkeypatch.setattr(check_mod.validator, "validator_running", lambda port: True)
+        monkeypatch.setattr(check_mod.validator, "validate_page", fake_validate)
+        _check_all_html(self._options(), [Path("a.html"), Path("b.html")])
+        captured = capsys.readouterr()
+        assert captured.out == "b.html: problem\n"
+        assert "a.html: unable to validate HTML: no HTML validator" in captured.err
@@ -2,16 +2,35 @@
 
 import argparse
 from pathlib import Path
+import subprocess
+import sys
 
+import pytest
+
+import mccole.clui as clui
 from mccole.clui import (
+    DEFAULT_TABSIZE,
+    _load_command,
     _make_bib_parser,
     _make_build_parser,
     _make_check_parser,
     _make_create_parser,
     _make_describe_parser,
     _make_detab_parser,
+    _make_serve_parser,
 )
-from mccole.detab import DEFAULT_TABSIZE
+from mccole.detab import detab
+
+# Modules that commands need but that starting the CLI must not import
+HEAVY_MODULES = [
+    "bs4",
+    "html5validator",
+    "jinja2",
+    "markdown",
+    "pygments",
+    "urllib.request",
+    "yaml",
+]
 
 
 def _parser(make_func):
@@ -36,6 +55,12 @@ class TestMakeBuildParser:
         assert args.root == Path("README.md")
         assert args.math is False
         assert args.forma is False
+        assert args.force is False
+        assert args.jobs == 1
+        assert args.link is False
+        assert args.parser is None
+        assert args.profile is None
+        assert args.watch is False
         assert args.single_page is None
         assert args.extra is None
 
@@ -48,10 +73,12 @@ class TestMakeBuildParser:
 class TestMakeCheckParser:
     def test_defaults(self):
         args = _parser(_make_check_parser).parse_args([])
+        assert args.jobs == 1
         assert args.src == Path(".")
         assert args.dst == Path("docs")
         assert args.root == Path("README.md")
         assert args.relaxed is False
+        assert args.parser is None
 
     def test_relaxed_flag(self):
         args = _parser(_make_check_parser).parse_args(["--relaxed"])
@@ -90,3 +117,36 @@ class TestMakeDetabParser:
         assert args.src == Path(".")
         assert args.root == Path("README.md")
         assert args.tabsize == DEFAULT_TABSIZE
+
+
+class TestMakeServeParser:
+    def test_defaults(self):
+        args = _parser(_make_serve_parser).parse_args([])
+        assert args.src == Path(".")
+        assert args.dst == Path("docs")
+        assert args.host == "localhost"
+        assert args.port == 8000
+
+
+class TestLazyCommands:
+    def test_startup_does_not_import_commands(self):
+        code = (
+            "import sys; import mccole.clui; "
+            f"print([m for m in {HEAVY_MODULES!r} if m in sys.modules])"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        )
+        assert result.stdout.strip() == "[]"
+
+    def test_load_command(self):
+        assert _load_command("detab", "detab") is detab
+
+    def test_version(self, monkeypatch, capsys):
+        monkeypatch.setattr(sys, "argv", ["mccole", "--version"])
+        clui.main()
+        assert capsys.readouterr().out.strip() == clui.__version__
+
+    def test_unknown_module(self):
+        with pytest.raises(ModuleNotFoundError):
+            _load_command("nonexistent", "run")
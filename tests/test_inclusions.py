@@ -1,10 +1,14 @@
 """Tests for mccole.inclusions."""
 
+import io
 from pathlib import Path
 import textwrap
 
+from pygments.lexers import get_lexer_by_name
 import pytest
 
+import mccole.inclusions as inclusions_mod
+from mccole import util
 from mccole.inclusions import (
     _colorize_code,
     _filter_exclude,
@@ -12,7 +16,12 @@ from mccole.inclusions import (
     _filter_include,
     _filter_scrub,
     _get_comment_format,
+    _get_lexer,
+    _highlight_file,
     COMMENT_FORMATS,
+    INCLUSION_CACHE_DIR,
+    LEXER_NAMES,
+    patch_inclusions,
 )
 
 
@@ -210,3 +219,118 @@ class TestColorizeCode:
         """Falls back to text lexer for unknown extension."""
         result = _colorize_code("hello", "test.xyzzy")
         assert 'class="codehilite"' in result
+
+
+class TestGetLexer:
+    def test_every_comment_format_has_lexer(self):
+        assert set(LEXER_NAMES) == set(COMMENT_FORMATS)
+        for name in LEXER_NAMES.values():
+            get_lexer_by_name(name)
+
+    def test_lexers_are_shared(self):
+        assert _get_lexer("a.py") is _get_lexer("sub/b.py")
+        assert _get_lexer("a.py").name == "Python"
+
+    def test_other_files_looked_up_by_name(self):
+        assert _get_lexer("Makefile").name == "Makefile"
+        assert _get_lexer("test.xyzzy").name == "Text only"
+
+    def test_override_by_suffix(self):
+        assert _get_lexer("a.txt", {".txt": "python"}).name == "Python"
+        assert _get_lexer("a.txt").name == "Text only"
+
+    def test_override_by_name(self):
+        overrides = {"CMakeLists.txt": "cmake", ".txt": "python"}
+        assert _get_lexer("CMakeLists.txt", overrides).name == "CMake"
+
+    def test_unknown_override_warns(self):
+        buf = io.StringIO()
+        old_stderr = util.sys.stderr
+        util.sys.stderr = buf
+        try:
+            lexer = _get_lexer("a.qq", {".qq": "no-such-lexer"})
+        finally:
+            util.sys.stderr = old_stderr
+        assert lexer.name == "Text only"
+        assert "no-such-lexer" in buf.getvalue()
+
+
+class TestPatchInclusions:
+    def _include(self, tmp_path, parser):
+        (tmp_path / "x.py").write_text("x = 1\n", encoding="utf-8")
+        config = {"src": tmp_path, "parser": parser}
+        doc = util.make_soup('<div data-inc="x.py"></div>', parser)
+        patch_inclusions(config, tmp_path / "index.md", tmp_path / "index.html", doc)
+        return doc
+
+    def test_replaces_div_with_highlighted_code(self, tmp_path):
+        doc = self._include(tmp_path, util.HTML_PARSER)
+        div = doc.find("div", attrs={"data-inc": "x.py"})
+        assert div.find("span", class_="inc-path")["title"] == "x.py"
+        assert div.find("div", class_="codehilite") is not None
+
+    def test_other_parsers_include_same_content(self, tmp_path):
+        """Fragments wrapped in <html><body> by other parsers are unwrapped."""
+        pytest.importorskip("lxml")
+        expected = self._include(tmp_path, util.HTML_PARSER)
+        actual = self._include(tmp_path, "lxml")
+        selector = "div[data-inc]"
+        assert str(actual.select(selector)[0]) == str(expected.select(selector)[0])
+
+
+class TestHighlightFile:
+    def _setup(self, tmp_path):
+        src = tmp_path / "src"
+        src.mkdir()
+        filepath = src / "x.py"
+        filepath.write_text(
+            "# mccole: a\nx = 1\n# mccole: /a\ny = 2\n", encoding="utf-8"
+        )
+        return {"src": src, "dst": tmp_path / "docs"}, filepath
+
+    def _highlight(self, config, filepath, mark=""):
+        return _highlight_file(config, filepath, "x.py", mark, "", "", "")
+
+    def test_result_is_cached(self, tmp_path, monkeypatch):
+        config, filepath = self._setup(tmp_path)
+        first = self._highlight(config, filepath)
+        assert len(list((config["dst"] / INCLUSION_CACHE_DIR).iterdir())) == 1
+
+        def fail(*args):
+            raise AssertionError("should not highlight")
+
+        monkeypatch.setattr(inclusions_mod, "_colorize_code", fail)
+        assert self._highlight(config, filepath) == first
+
+    def test_changed_file_is_highlighted_again(self, tmp_path):
+        config, filepath = self._setup(tmp_path)
+        self._highlight(config, filepath)
+        filepath.write_text("z = 3\n", encoding="utf-8")
+        util.refresh_files(util.file_cache(config))
+        assert "z" in self._highlight(config, filepath)["html"]
+        assert len(list((config["dst"] / INCLUSION_CACHE_DIR).iterdir())) == 2
+
+    def test_filters_are_part_of_key(self, tmp_path):
+        config, filepath = self._setup(tmp_path)
+        whole = self._highlight(config, filepath)
+        part = self._highlight(config, filepath, mark="a")
+        assert whole["html"] != part["html"]
+        assert "y" not in part["html"]
+
+    def test_missing_marker_remembered(self, tmp_path):
+        config, filepath = self._setup(tmp_path)
+        assert self._highlight(config, filepath, mark="b")["marker_missing"]
+        assert self._highlight(config, filepath, mark="b")["marker_missing"]
+
+    def test_no_cache_when_building_in_memory(self, tmp_path):
+        config, filepath = self._setup(tmp_path)
+        config["output"] = {}
+        self._highlight(config, filepath)
+        assert not (config["dst"] / INCLUSION_CACHE_DIR).exists()
+
+    def test_corrupt_cache_entry_ignored(self, tmp_path):
+        config, filepath = self._setup(tmp_path)
+        expected = self._highlight(config, filepath)
+        for path in (config["dst"] / INCLUSION_CACHE_DIR).iterdir():
+            path.write_text("{not json", encoding="utf-8")
+        assert self._highlight(config, filepath) == expected
@@ -0,0 +1,128 @@
+"""Tests for mccole.manifest."""
+
+import os
+from pathlib import Path
+
+from mccole import manifest
+
+
+def _config(tmp_path):
+    src = tmp_path / "src"
+    src.mkdir(exist_ok=True)
+    (src / "_templates").mkdir(exist_ok=True)
+    (src / "_templates" / "page.html").write_text("{{ content }}", encoding="utf-8")
+    (src / "README.md").write_text("# Book\n", encoding="utf-8")
+    (src / "pyproject.toml").write_text("[tool.mccole]\n", encoding="utf-8")
+    return {
+        "src": src,
+        "dst": tmp_path / "docs",
+        "config": src / "pyproject.toml",
+        "extras": src / "_extras",
+        "home_page": Path("README.md"),
+        "templates": src / "_templates",
+    }
+
+
+class TestLoadSaveManifest:
+    def test_missing_manifest_is_empty(self, tmp_path):
+        assert manifest.load_manifest(tmp_path) == manifest.empty_manifest()
+
+    def test_round_trip(self, tmp_path):
+        data = manifest.empty_manifest()
+        data["global"] = "abc"
+        data["pages"]["intro/index.md"] = {"hash": "123", "deps": [], "ix_entries": []}
+        manifest.save_manifest(tmp_path, data)
+        assert manifest.load_manifest(tmp_path) == data
+
+    def test_unchanged_manifest_not_rewritten(self, tmp_path):
+        data = manifest.empty_manifest()
+        manifest.save_manifest(tmp_path, data)
+        path = tmp_path / manifest.MANIFEST_PATH
+        os.utime(path, ns=(0, 0))
+        manifest.save_manifest(tmp_path, data)
+        assert path.stat().st_mtime_ns == 0
+
+    def test_corrupt_manifest_is_empty(self, tmp_path):
+        path = tmp_path / manifest.MANIFEST_PATH
+        path.parent.mkdir(parents=True)
+        path.write_text("{not json", encoding="utf-8")
+        assert manifest.load_manifest(tmp_path) == manifest.empty_manifest()
+
+
+class TestGlobalHash:
+    def test_stable_when_nothing_changes(self, tmp_path):
+        config = _config(tmp_path)
+        assert manifest.global_hash(config) == manifest.global_hash(config)
+
+    def test_changes_with_template(self, tmp_path):
+        config = _config(tmp_path)
+        before = manifest.global_hash(config)
+        (config["templates"] / "page.html").write_text("changed", encoding="utf-8")
+        assert manifest.global_hash(config) != before
+
+    def test_changes_with_template_in_subdirectory(self, tmp_path):
+        config = _config(tmp_path)
+        partial = config["templates"] / "partials" / "nav.html"
+        partial.parent.mkdir()
+        partial.write_text("<nav></nav>", encoding="utf-8")
+        before = manifest.global_hash(config)
+        partial.write_text("<nav>changed</nav>", encoding="utf-8")
+        assert manifest.global_hash(config) != before
+
+    def test_changes_with_options(self, tmp_path):
+        config = _config(tmp_path)
+        before = manifest.global_hash(config)
+        config["math"] = True
+        assert manifest.global_hash(config) != before
+
+
+class TestPageEntry:
+    def test_records_included_files(self, tmp_path):
+        config = _config(tmp_path)
+        page = config["src"] / "intro" / "index.md"
+        page.parent.mkdir()
+        page.write_text(
+            "[%inc a.py %]\n[%table slug=t tbl=t.md %]\n[%linecount b.py %]\n",
+            encoding="utf-8",
+        )
+        entry = manifest.page_entry(config, page)
+        assert entry["deps"] == [
+            "intro/a.py",
+            "intro/b.py",
+            "intro/index.md",
+            "intro/t.md",
+        ]
+
+    def test_hash_changes_with_included_file(self, tmp_path):
+        config = _config(tmp_path)
+        page = config["src"] / "intro" / "index.md"
+        page.parent.mkdir()
+        page.write_text("[%inc a.py %]\n", encoding="utf-8")
+        (page.parent / "a.py").write_text("x = 1\n", encoding="utf-8")
+        before = manifest.page_entry(config, page)["hash"]
+        (page.parent / "a.py").write_text("x = 2\n", encoding="utf-8")
+        assert manifest.page_entry(config, page)["hash"] != before
+
+
+class TestIsUnchanged:
+    def _manifests(self, old_hash, new_hash):
+        previous = {"global": "g", "pages": {"p": {"hash": old_hash}}}
+        current = {"global": "g", "pages": {"p": {"hash": new_hash}}}
+        return previous, current
+
+    def test_same_hash_and_output_exists(self):
+        previous, current = self._manifests("h", "h")
+        assert manifest.is_unchanged(previous, current, "p", True)
+
+    def test_missing_output(self):
+        previous, current = self._manifests("h", "h")
+        assert not manifest.is_unchanged(previous, current, "p", False)
+
+    def test_different_hash(self):
+        previous, current = self._manifests("h", "other")
+        assert not manifest.is_unchanged(previous, current, "p", True)
+
+    def test_different_global(self):
+        previous, current = self._manifests("h", "h")
+        current["global"] = "changed"
+        assert not manifest.is_unchanged(previous, current, "p", True)
@@ -0,0 +1,101 @@
+"""Tests for mccole.profiling."""
+
+import io
+import json
+from pathlib import Path
+import sys
+
+from mccole.profiling import (
+    make_report,
+    merge_timings,
+    print_report,
+    save_report,
+    stage,
+)
+
+
+def _timings():
+    return {
+        "a.md": {"markdown": {"seconds": 2.0, "calls": 1}},
+        "b.md": {
+            "markdown": {"seconds": 1.0, "calls": 1},
+            "parse": {"seconds": 3.0, "calls": 1},
+        },
+    }
+
+
+class TestStage:
+    def test_does_nothing_when_not_profiling(self):
+        config = {"src": Path("src"), "timings": None}
+        with stage(config, Path("src/a.md"), "markdown"):
+            pass
+        assert config["timings"] is None
+
+    def test_records_time_and_calls_per_page(self):
+        config = {"src": Path("src"), "timings": {}}
+        for _ in range(2):
+            with stage(config, Path("src/ch/index.md"), "markdown"):
+                pass
+        entry = config["timings"]["ch/index.md"]["markdown"]
+        assert entry["calls"] == 2
+        assert entry["seconds"] >= 0.0
+
+    def test_records_time_when_stage_fails(self):
+        config = {"src": Path("src"), "timings": {}}
+        try:
+            with stage(config, Path("elsewhere.md"), "parse"):
+                raise ValueError
+        except ValueError:
+            pass
+        assert config["timings"]["elsewhere.md"]["parse"]["calls"] == 1
+
+
+class TestMergeTimings:
+    def test_adds_pages_and_stages(self):
+        timings = _timings()
+        merge_timings(
+            timings,
+            {
+                "a.md": {"markdown": {"seconds": 1.0, "calls": 1}},
+                "c.md": {"write": {"seconds": 0.5, "calls": 1}},
+            },
+        )
+        assert timings["a.md"]["markdown"] == {"seconds": 3.0, "calls": 2}
+        assert timings["c.md"]["write"] == {"seconds": 0.5, "calls": 1}
+
+
+class TestMakeReport:
+    def test_totals_each_stage(self):
+        report = make_report(_timings())
+        assert report["total"]["markdown"] == {"seconds": 3.0, "calls": 2}
+        assert report["total"]["parse"] == {"seconds": 3.0, "calls": 1}
+        assert set(report["pages"]) == {"a.md", "b.md"}
+
+    def test_save_as_json(self, tmp_path):
+        path = tmp_path / "profile.json"
+        report = make_report(_timings())
+        save_report(path, report)
+        assert json.loads(path.read_text(encoding="utf-8")) == report
+
+
+class TestPrintReport:
+    def _print(self, report):
+        buf = io.StringIO()
+        old_stdout = sys.stdout
+        sys.stdout = buf
+        try:
+            print_report(report)
+        finally:
+            sys.stdout = old_stdout
+        return buf.getvalue()
+
+    def test_slowest_pages_and_stages_first(self):
+        lines = self._print(make_report(_timings())).splitlines()
+        assert lines[0].split() == ["Stage", "Calls", "Seconds", "%"]
+        assert lines[2].split()[0] in {"markdown", "parse"}
+        page_rows = lines[lines.index("") + 3 :]
+        assert page_rows[0].split() == ["b.md", "4.000", "parse"]
+        assert page_rows[1].split() == ["a.md", "2.000", "markdown"]
+
+    def test_nothing_to_report(self):
+        assert self._print(make_report({})) == ""
@@ -0,0 +1,174 @@
+"""Tests for mccole.serve."""
+
+import argparse
+from argparse import Namespace
+from functools import partial
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from mccole.build import build
+from mccole.clui import _make_build_parser
+from mccole.create import create
+import mccole.serve as serve_mod
+import mccole.watch as watch_mod
+from mccole.serve import (
+    RELOAD_SCRIPT,
+    _Handler,
+    _inject_reload,
+    _notify,
+    _output_path,
+    serve,
+)
+
+
+@pytest.fixture
+def server(tmp_path):
+    """Serve a small in-memory site on an unused port."""
+    asset = tmp_path / "style.css"
+    asset.write_text("body {}\n", encoding="utf-8")
+    dst = Path("docs")
+    output = {
+        dst / "index.html": "<html><body><p>home</p></body></html>",
+        dst / "intro" / "index.html": "<html><body><p>intro</p></body></html>",
+        dst / "_static" / "style.css": asset,
+    }
+    config = {"dst": dst, "verbose": 0}
+    reloader = {"version": 0, "changed": threading.Condition()}
+    handler = partial(_Handler, config, output, reloader)
+    httpd = ThreadingHTTPServer(("localhost", 0), handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://localhost:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _get(url):
+    with urllib.request.urlopen(url) as response:
+        return response.headers["Content-Type"], response.read().decode("utf-8")
+
+
+class TestOutputPath:
+    def test_root(self):
+        assert _output_path({"dst": Path("docs")}, "/") == Path("docs")
+
+    def test_nested(self):
+        config = {"dst": Path("docs")}
+        assert _output_path(config, "/intro/x.py") == Path("docs/intro/x.py")
+
+    def test_parent_references_dropped(self):
+        config = {"dst": Path("docs")}
+        assert _output_path(config, "/../etc/passwd") == Path("docs/etc/passwd")
+
+
+class TestInjectReload:
+    def test_before_closing_body(self):
+        result = _inject_reload("<body><p>x</p></body></html>")
+        assert result == f"<body><p>x</p>{RELOAD_SCRIPT}</body></html>"
+
+    def test_appended_without_body(self):
+        assert _inject_reload("<p>x</p>") == f"<p>x</p>{RELOAD_SCRIPT}"
+
+
+class TestNotify:
+    def test_increments_version(self):
+        reloader = {"version": 0, "changed": threading.Condition()}
+        _notify(reloader)
+        assert reloader["version"] == 1
+
+
+class TestHandler:
+    def test_serves_page_with_reload_script(self, server):
+        content_type, body = _get(f"{server}/intro/")
+        assert content_type.startswith("text/html")
+        assert "<p>intro</p>" in body
+        assert RELOAD_SCRIPT in body
+
+    def test_redirects_directory_without_slash(self, server):
+        _, body = _get(f"{server}/intro")
+        assert "<p>intro</p>" in body
+
+    def test_serves_copied_file_from_source(self, server):
+        content_type, body = _get(f"{server}/_static/style.css")
+        assert content_type == "text/css"
+        assert body == "body {}\n"
+
+    def test_missing_page(self, server):
+        with pytest.raises(urllib.error.HTTPError) as exc:
+            _get(f"{server}/missing/")
+        assert exc.value.code == 404
+
+
+class TestServe:
+    def test_keeps_serving_after_failed_rebuild(self, monkeypatch, capsys):
+        servers = []
+        pages = []
+
+        class RecordingServer(ThreadingHTTPServer):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                servers.append(self)
+
+        def fake_build(options, output):
+            output[Path("docs") / "index.html"] = "<p>home</p>"
+            return {"src": Path("src"), "dst": Path("docs"), "verbose": 0}, None
+
+        def fake_step(options, config, env, changed):
+            if not pages:
+                pages.append(None)
+                raise ValueError("unclosed frontmatter")
+            port = servers[0].server_address[1]
+            pages.append(_get(f"http://localhost:{port}/")[1])
+            raise KeyboardInterrupt()
+
+        snapshots = iter([{}, {Path("a.md"): 1}, {Path("a.md"): 2}])
+        monkeypatch.setattr(serve_mod, "build", fake_build)
+        monkeypatch.setattr(serve_mod, "ThreadingHTTPServer", RecordingServer)
+        monkeypatch.setattr(watch_mod.time, "sleep", lambda seconds: None)
+        monkeypatch.setattr(watch_mod, "_snapshot", lambda config: next(snapshots))
+        monkeypatch.setattr(watch_mod, "_watch_step", fake_step)
+        serve(Namespace(host="localhost", port=0, validator=False))
+        servers[0].server_close()
+        assert "<p>home</p>" in pages[1]
+        assert "rebuild failed: unclosed frontmatter" in capsys.readouterr().err
+
+
+class TestInMemoryRebuild:
+    def test_reverted_template_edit_restores_pages(self, tmp_path):
+        src = tmp_path / "site"
+        create(Namespace(dst=src, force=True, only=None, verbose=0))
+        (src / "pyproject.toml").write_text(
+            '[project]\nname = "site"\n\n[tool.mccole]\n', encoding="utf-8"
+        )
+        (src / "README.md").write_text(
+            '# Site\n\n<div id="lessons" markdown="1">\n'
+            "1.  [Intro](@/intro/)\n</div>\n",
+            encoding="utf-8",
+        )
+        (src / "intro").mkdir()
+        (src / "intro" / "index.md").write_text("# Intro\n\nHello.\n", "utf-8")
+        parser = argparse.ArgumentParser()
+        parser.add_argument("--verbose", type=int, default=0)
+        _make_build_parser(parser)
+        options = parser.parse_args(["--src", str(src), "--dst", str(src / "docs")])
+        build(options)
+
+        output = {}
+        config, env = build(options, output)
+        page = config["dst"] / "intro" / "index.html"
+        original = output[page]
+        template = src / "_templates" / "page.html"
+        text = template.read_text(encoding="utf-8")
+        edited = text.replace("</body>", "<p>edited</p></body>")
+        template.write_text(edited, encoding="utf-8")
+        config, env = watch_mod._watch_step(options, config, env, {template})
+        assert "<p>edited</p>" in output[page]
+
+        template.write_text(text, encoding="utf-8")
+        config, env = watch_mod._watch_step(options, config, env, {template})
+        assert output[page] == original
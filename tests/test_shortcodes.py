@@ -2,19 +2,33 @@
 
 import io
 from pathlib import Path
+import random
+import shlex
 import textwrap
 
+import pytest
+
 import mccole.shortcodes as shortcodes
 from mccole import util
 
 from mccole.shortcodes import (
+    parse_args,
     process_shortcodes,
+    split_args,
     _page_slug,
     _crossref_link,
     _missing_shortcode_arg,
 )
 
 
+def _shlex_split(text):
+    """How shortcode arguments used to be split."""
+    try:
+        return shlex.split(text)
+    except ValueError:
+        return text.split()
+
+
 class TestPageSlug:
     def test_readme_is_home(self):
         assert _page_slug(Path("/test/README.md")) == "home"
@@ -46,6 +60,53 @@ class TestMissingShortcodeArg:
         assert "missing name" in buf.getvalue()
 
 
+class TestSplitArgs:
+    @pytest.mark.parametrize(
+        "text",
+        [
+            "",
+            "   ",
+            "key",
+            '"quoted key" "Shown Text"',
+            "slug=fig1 img=fig.svg alt='A figure' caption=\"The figure.\"",
+            'scrub="\\s*# \\[scrub\\]"',
+            'a\\ b \'c\\d\' "e\\"f"',
+            "x=\"\" ''",
+            "'unbalanced quote",
+            "trailing\\",
+            "one\ttwo\nthree",
+        ],
+    )
+    def test_same_as_shlex(self, text):
+        assert split_args(text) == _shlex_split(text)
+
+    def test_same_as_shlex_on_random_text(self):
+        rng = random.Random(42)
+        alphabet = ["a", "=", " ", "\t", "\n", "'", '"', "\\", "\x0b", "é"]
+        for _ in range(5000):
+            text = "".join(rng.choice(alphabet) for _ in range(rng.randrange(12)))
+            assert split_args(text) == _shlex_split(text), repr(text)
+
+
+class TestParseArgs:
+    def test_positional_and_keyword(self):
+        pargs, kwargs = parse_args('"key" "Text" mark=main omit="skip"')
+        assert pargs == ["key", "Text"]
+        assert kwargs == {"mark": "main", "omit": "skip"}
+
+    def test_cached_results_not_shared(self):
+        first, first_kw = parse_args("a b=c")
+        first.append("changed")
+        first_kw["b"] = "changed"
+        assert parse_args("a b=c") == (["a"], {"b": "c"})
+
+    def test_cache_is_bounded(self):
+        for i in range(shortcodes._PARSED_ARGS_SIZE + 10):
+            parse_args(f"arg{i}")
+        info = shortcodes._parse_args_cached.cache_info()
+        assert info.currsize <= shortcodes._PARSED_ARGS_SIZE
+
+
 class TestProcessShortcodesBasic:
     def test_unknown_shortcode_preserved(self, basic_config):
         """Unknown tags are left as-is with a warning."""
@@ -342,6 +403,25 @@ class TestShortcodeThanks:
             shortcodes.util.sys.stderr = old
         assert "the contributors" in result
 
+    def test_file_parsed_once_per_build(self, tmp_path, basic_config, monkeypatch):
+        extras = tmp_path / "extras"
+        extras.mkdir()
+        basic_config["extras"] = extras
+        (extras / "thanks.yml").write_text(
+            "- personal: Alice\n  family: Smith\n", encoding="utf-8"
+        )
+        calls = []
+        monkeypatch.setattr(
+            shortcodes.yaml,
+            "safe_load",
+            lambda text: calls.append(text) or [{"personal": "A", "family": "S"}],
+        )
+        result = process_shortcodes(
+            "[% thanks %] [% thanks %]", basic_config, Path("test.md"), []
+        )
+        assert result == "A S A S"
+        assert len(calls) == 1
+
 
 class TestShortcodesWithGlossaryBib:
     def test_glossary_and_bib_links(self, src_with_glossary_bib):
@@ -351,7 +431,7 @@ class TestShortcodesWithGlossaryBib:
             "src": src,
             "dst": src.parent / "docs",
             "home_page": Path("README.md"),
-            "links": util.load_links(src),
+            "references": util.load_references(util.load_links(src)),
             "order": util.load_order(src, Path("README.md")),
             "templates": src.parent / "_templates",
             "repo": "",
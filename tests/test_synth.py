@@ -0,0 +1,65 @@
+"""Tests for the synthetic benchmark book in bench/synth.py."""
+
+import argparse
+from pathlib import Path
+
+import pytest
+
+import mccole.check as check_mod
+from mccole.build import build
+from mccole.clui import _make_build_parser, _make_check_parser
+
+
+BENCH_DIR = Path(__file__).parent.parent / "bench"
+
+
+@pytest.fixture
+def synth(monkeypatch):
+    """Import the book generator from the benchmark directory."""
+    monkeypatch.syspath_prepend(str(BENCH_DIR))
+    import synth
+
+    return synth
+
+
+def _options(make_parser, args):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--verbose", type=int, default=0)
+    make_parser(parser)
+    return parser.parse_args(args)
+
+
+class TestSynth:
+    def test_tiny_book_passes_check(self, synth, tmp_path, monkeypatch, capsys):
+        src = tmp_path / "book"
+        dst = src / "docs"
+        synth.generate(
+            synth.parse_args(
+                [
+                    "--dst",
+                    str(src),
+                    "--chapters",
+                    "3",
+                    "--keys",
+                    "7",
+                    "--listings",
+                    "1",
+                    "--figures",
+                    "1",
+                    "--tables",
+                    "1",
+                    "--index",
+                    "2",
+                    "--paragraphs",
+                    "3",
+                ]
+            )
+        )
+        build(_options(_make_build_parser, ["--src", str(src), "--dst", str(dst)]))
+        capsys.readouterr()
+
+        monkeypatch.setattr(check_mod, "_check_all_html", lambda options, paths: None)
+        check_mod.check(
+            _options(_make_check_parser, ["--src", str(src), "--dst", str(dst)])
+        )
+        assert capsys.readouterr() == ("", "")
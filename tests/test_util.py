@@ -1,9 +1,12 @@
 """Tests for mccole.util."""
 
 import io
+import os
 from pathlib import Path
 
 from bs4 import BeautifulSoup
+from markdown import markdown
+import pytest
 
 from mccole import util
 from mccole.util import _get_slug_from_link, _load_order_section
@@ -42,6 +45,62 @@ class TestLoadOrder:
         assert order["refs"]["next"] is None
 
 
+class TestLoadGlossary:
+    def test_extracts_ids_and_terms(self, tmp_path):
+        gloss_dir = tmp_path / "glossary"
+        gloss_dir.mkdir()
+        (gloss_dir / "index.md").write_text(
+            '<span id="term1">Term One</span>\n:   Definition.\n',
+            encoding="utf-8",
+        )
+        result = util.load_glossary(tmp_path)
+        assert result == {"term1": "Term One"}
+
+
+class TestLoadProject:
+    def test_extracts_title_and_repo(self, tmp_path):
+        (tmp_path / "README.md").write_text(
+            "# My Book\n\n[repo]: https://github.com/x/y\n", encoding="utf-8"
+        )
+        project = util.load_project(tmp_path, Path("README.md"))
+        assert project["title"] == "My Book"
+        assert project["repo"] == "https://github.com/x/y"
+
+    def test_missing_title_and_repo_are_empty(self, tmp_path):
+        (tmp_path / "README.md").write_text("No heading here.\n", encoding="utf-8")
+        project = util.load_project(tmp_path, Path("README.md"))
+        assert project["title"] == ""
+        assert project["repo"] == ""
+
+    def test_missing_home_page_raises(self, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            util.load_project(tmp_path, Path("MISSING.md"))
+
+    def test_home_page_parsed_once(self, src_dir, monkeypatch):
+        """Loading an unchanged project again reuses the first parse."""
+        first = util.load_project(src_dir, Path("README.md"))
+        monkeypatch.setattr(util, "markdown_to_html", None)
+        assert util.load_project(src_dir, Path("README.md")) is first
+        assert util.load_order(src_dir, Path("README.md")) is first["order"]
+
+    def test_reloads_when_home_page_changes(self, src_dir):
+        readme = src_dir / "README.md"
+        first = util.load_project(src_dir, Path("README.md"))
+        readme.write_text(
+            readme.read_text(encoding="utf-8") + "\nMore text.\n", encoding="utf-8"
+        )
+        second = util.load_project(src_dir, Path("README.md"))
+        assert second is not first
+        assert second["order"].keys() == first["order"].keys()
+
+    def test_glossary_loaded_lazily(self, src_with_glossary_bib, monkeypatch):
+        project = util.load_project(src_with_glossary_bib, Path("README.md"))
+        assert project["glossaries"] == {}
+        glossary = util.project_glossary(project)
+        monkeypatch.setattr(util, "load_glossary", None)
+        assert util.project_glossary(project) is glossary
+
+
 class TestLoadSlides:
     def test_no_slides_div(self, src_dir):
         """Returns empty list when no slides div."""
@@ -60,6 +119,7 @@ class TestLoadSlides:
         assert len(slides) == 1
         assert slides[0]["href"] == "@/intro/slides.html"
         assert slides[0]["title"] == "Slides"
+        assert slides[0]["src_file"] == src / "intro" / "slides.md"
 
 
 class TestSlidesSrcFile:
@@ -94,6 +154,10 @@ class TestLoadOrderSection:
         assert result["intro"]["kind"] == "lessons"
         assert result["intro"]["title"] == "Intro"
 
+    def test_missing_section_is_empty(self):
+        doc = BeautifulSoup('<div id="lessons"></div>', "html.parser")
+        assert _load_order_section(doc, "appendices", lambda i: str(i)) == {}
+
 
 class TestWarn:
     def test_writes_to_stderr(self):
@@ -106,3 +170,205 @@ class TestWarn:
         finally:
             util.sys.stderr = old_stderr
         assert "test message" in buf.getvalue()
+
+
+_NODES_HTML = (
+    "<html><head><title>t</title>"
+    '<link href="@/s.css"><script src="@/s.js"></script></head><body>'
+    '<h1>One</h1><p id="terms"></p><p id="other"></p>'
+    '<a href="g:key">k</a><a name="x">no href</a><img src="@/x.png">'
+    '<figure id="f:a"><figcaption>c</figcaption></figure>'
+    '<div id="t:b" data-caption="c" markdown="1">'
+    "<table><thead><tr><th>h</th></tr></thead>"
+    "<tbody><tr><th>r</th><td>d</td></tr></tbody></table></div>"
+    '<div data-inc="x.py"></div><div id="u:c"></div>'
+    '<pre><code class="language-py">x</code></pre><code>y</code>'
+    '<section class="exercises"></section><section class="other"></section>'
+    "</body></html>"
+)
+
+
+class TestCollectNodes:
+    def test_matches_selectors(self):
+        """Each group holds the same nodes as selecting with its selector."""
+        doc = BeautifulSoup(_NODES_HTML, "html.parser")
+        nodes = util.collect_nodes(doc)
+        for selector, found in nodes.items():
+            assert found == doc.select(selector), selector
+            assert all(a is b for a, b in zip(found, doc.select(selector)))
+
+    def test_adds_to_existing_groups(self):
+        """Collecting below a node appends its descendants to existing groups."""
+        doc = BeautifulSoup("<div><pre>x</pre></div><div></div>", "html.parser")
+        nodes = util.collect_nodes(doc)
+        target = doc.find_all("div")[1]
+        target.append(doc.new_tag("pre"))
+        util.collect_nodes(target, nodes)
+        assert len(nodes["pre"]) == 2
+        assert nodes["pre"][1] is target.pre
+
+
+class TestHtmlParser:
+    def test_default(self):
+        assert util.html_parser() == util.HTML_PARSER
+
+    def test_named_parser_available(self):
+        assert util.html_parser("html.parser") == "html.parser"
+
+    def test_unknown_parser_falls_back(self):
+        buf = io.StringIO()
+        old_stderr = util.sys.stderr
+        util.sys.stderr = buf
+        try:
+            result = util.html_parser("no-such-parser")
+        finally:
+            util.sys.stderr = old_stderr
+        assert result == util.HTML_PARSER
+        assert "no-such-parser" in buf.getvalue()
+
+    def test_fast_uses_first_installed(self, monkeypatch):
+        monkeypatch.setattr(
+            util, "FAST_HTML_PARSERS", ["no-such-parser", "html.parser"]
+        )
+        assert util.html_parser("fast") == "html.parser"
+
+
+class TestMakeSoup:
+    def test_default_parser(self):
+        doc = util.make_soup("<p>x</p>")
+        assert str(doc) == "<p>x</p>"
+
+    def test_same_document_with_lxml(self):
+        """Parsing a whole page with lxml gives the same tree."""
+        pytest.importorskip("lxml")
+        html = "<html><head><title>t</title></head><body><p>x<br/>y</p></body></html>"
+        assert str(util.make_soup(html, "lxml")) == str(util.make_soup(html))
+
+
+class TestMarkdownToHtml:
+    def test_same_as_markdown(self):
+        text = "# Title {: #t }\n\n| a |\n|---|\n| 1 |\n\n```py\nx = 1\n```\n"
+        assert util.markdown_to_html(text) == markdown(
+            text, extensions=util.MARKDOWN_EXTENSIONS
+        )
+
+    def test_converter_reused(self, monkeypatch):
+        util.markdown_to_html("first")
+        monkeypatch.setattr(util, "Markdown", None)
+        assert util.markdown_to_html("*second*") == "<p><em>second</em></p>"
+
+    def test_state_reset_between_documents(self):
+        util.markdown_to_html("[x]: https://example.com\n")
+        assert "href" not in util.markdown_to_html("[a][x]")
+
+    def test_site_references(self):
+        refs = util.load_references("[x]: https://example.com\n")
+        html = util.markdown_to_html("[a][x]", refs)
+        assert html == '<p><a href="https://example.com">a</a></p>'
+        assert "href" not in util.markdown_to_html("[a][x]")
+
+    def test_site_references_replace_page_references(self):
+        """Site references win, as they did when appended to the page."""
+        refs = util.load_references("[x]: https://site.com\n")
+        text = "[a][x]\n\n[x]: https://page.com\n"
+        expected = markdown(
+            text + "\n\n[x]: https://site.com\n",
+            extensions=util.MARKDOWN_EXTENSIONS,
+        )
+        assert util.markdown_to_html(text, refs) == expected
+        assert "site.com" in expected
+
+
+class TestLoadReferences:
+    def test_parses_definitions(self):
+        refs = util.load_references(
+            '[One]: https://one.com\n[two]: https://two.com "Two"\n'
+        )
+        assert refs == {
+            "one": ("https://one.com", None),
+            "two": ("https://two.com", "Two"),
+        }
+
+    def test_empty(self):
+        assert util.load_references("") == {}
+
+
+class TestSelectNodes:
+    def test_selects_without_groups(self):
+        doc = BeautifulSoup("<pre>x</pre>", "html.parser")
+        assert util.select_nodes(doc, None, "pre") == doc.select("pre")
+
+    def test_uses_groups_when_given(self):
+        doc = BeautifulSoup("<pre>x</pre>", "html.parser")
+        assert util.select_nodes(doc, {"pre": []}, "pre") == []
+
+
+class TestCachedFiles:
+    def test_text_read_once(self, tmp_path, monkeypatch):
+        path = tmp_path / "a.txt"
+        path.write_bytes(b"one\r\ntwo\n")
+        files = {}
+        assert util.cached_text(files, path) == "one\ntwo\n"
+        monkeypatch.setattr(Path, "read_bytes", lambda self: pytest.fail("re-read"))
+        assert util.cached_text(files, path) == "one\ntwo\n"
+
+    def test_missing_file_checked_once(self, tmp_path):
+        path = tmp_path / "a.txt"
+        files = {}
+        assert not util.cached_exists(files, path)
+        path.write_text("now here", encoding="utf-8")
+        assert not util.cached_exists(files, path)
+        with pytest.raises(FileNotFoundError):
+            util.cached_bytes(files, path)
+
+    def test_value_computed_once(self, tmp_path):
+        path = tmp_path / "a.txt"
+        path.write_text("a b c", encoding="utf-8")
+        files = {}
+        calls = []
+
+        def count(text):
+            calls.append(text)
+            return len(text.split())
+
+        assert util.cached_value(files, path, "words", count) == 3
+        assert util.cached_value(files, path, "words", count) == 3
+        assert len(calls) == 1
+
+    def test_refresh_forgets_changed_files(self, tmp_path):
+        same = tmp_path / "same.txt"
+        same.write_text("same", encoding="utf-8")
+        changed = tmp_path / "changed.txt"
+        changed.write_text("old", encoding="utf-8")
+        files = {}
+        util.cached_text(files, same)
+        util.cached_text(files, changed)
+        changed.write_text("newer", encoding="utf-8")
+        util.refresh_files(files)
+        assert set(files) == {same}
+        assert util.cached_text(files, changed) == "newer"
+
+    def test_file_cache_kept_in_config(self):
+        config = {}
+        assert util.file_cache(config) is util.file_cache(config)
+
+
+class TestWriteIfChanged:
+    def test_new_file_written(self, tmp_path):
+        path = tmp_path / "a.html"
+        assert util.write_if_changed(path, "text")
+        assert path.read_text(encoding="utf-8") == "text"
+
+    def test_same_content_left_alone(self, tmp_path):
+        path = tmp_path / "a.html"
+        path.write_text("text", encoding="utf-8")
+        os.utime(path, ns=(0, 0))
+        assert not util.write_if_changed(path, "text")
+        assert path.stat().st_mtime_ns == 0
+
+    def test_different_content_replaced(self, tmp_path):
+        path = tmp_path / "a.html"
+        path.write_text("text", encoding="utf-8")
+        assert util.write_if_changed(path, "txet")
+        assert path.read_text(encoding="utf-8") == "txet"
+        assert list(tmp_path.iterdir()) == [path]
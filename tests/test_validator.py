@@ -0,0 +1,163 @@
+"""Tests for mccole.validator."""
+
+from http.server import (
+    BaseHTTPRequestHandler,
+    SimpleHTTPRequestHandler,
+    ThreadingHTTPServer,
+)
+import json
+import socket
+import threading
+
+import pytest
+
+import mccole.validator as validator_mod
+from mccole.validator import (
+    VALIDATOR_HOST,
+    _format_message,
+    _is_reported,
+    start_validator,
+    validate_page,
+    validator_running,
+)
+
+
+# Messages returned by the fake validator for every page
+MESSAGES = [
+    {
+        "type": "error",
+        "firstLine": 3,
+        "firstColumn": 5,
+        "lastLine": 3,
+        "lastColumn": 9,
+        "message": "Element “div” not allowed as child of element “summary”",
+    },
+    {"type": "info", "subType": "warning", "lastLine": 1, "message": "Consider lang"},
+    {"type": "info", "lastLine": 2, "message": "Trailing slash"},
+]
+
+
+class _FakeValidator(BaseHTTPRequestHandler):
+    """Answer every page with the same messages and remember what was sent."""
+
+    received = []
+
+    def do_POST(self):
+        length = int(self.headers["Content-Length"])
+        self.received.append((self.headers["Content-Type"], self.rfile.read(length)))
+        body = json.dumps({"messages": MESSAGES}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _QuietFileServer(SimpleHTTPRequestHandler):
+    """An ordinary web server that isn't a validator."""
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _run_server(handler):
+    """Serve with handler on an unused port, yielding the port."""
+    httpd = ThreadingHTTPServer((VALIDATOR_HOST, 0), handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def fake_port():
+    """Run a fake validator on an unused port."""
+    _FakeValidator.received = []
+    yield from _run_server(_FakeValidator)
+
+
+@pytest.fixture
+def other_port():
+    """Run a web server that isn't a validator on an unused port."""
+    yield from _run_server(_QuietFileServer)
+
+
+def _unused_port():
+    with socket.socket() as sock:
+        sock.bind((VALIDATOR_HOST, 0))
+        return sock.getsockname()[1]
+
+
+class TestFormatMessage:
+    def test_error_with_range(self):
+        assert _format_message("a.html", MESSAGES[0]) == (
+            '"a.html":3.5-3.9: error: '
+            'Element "div" not allowed as child of element "summary"'
+        )
+
+    def test_warning_without_first_line(self):
+        assert _format_message("a.html", MESSAGES[1]) == (
+            '"a.html":1.0-1.0: info warning: Consider lang'
+        )
+
+
+class TestIsReported:
+    def test_errors_and_warnings_only(self):
+        assert [_is_reported(m) for m in MESSAGES] == [True, True, False]
+
+
+class TestValidatorRunning:
+    def test_running(self, fake_port):
+        assert validator_running(fake_port)
+
+    def test_not_running(self):
+        assert not validator_running(_unused_port())
+
+    def test_other_server_is_not_validator(self, other_port):
+        assert not validator_running(other_port)
+
+
+class TestStartValidator:
+    def test_listens_only_on_localhost(self, monkeypatch):
+        commands = []
+
+        class FakeProcess:
+            def poll(self):
+                return None
+
+        def fake_popen(command, **kwargs):
+            commands.append(command)
+            return FakeProcess()
+
+        monkeypatch.setattr(validator_mod.subprocess, "Popen", fake_popen)
+        monkeypatch.setattr(validator_mod, "validator_running", lambda port: True)
+        start_validator(8788)
+        assert "-Dnu.validator.servlet.bind-address=127.0.0.1" in commands[0]
+        assert commands[0][-1] == "8788"
+
+
+class TestValidatePage:
+    def test_sends_page_and_reports_messages(self, fake_port, tmp_path):
+        page = tmp_path / "index.html"
+        page.write_text("<html></html>", encoding="utf-8")
+        lines = validate_page(fake_port, page)
+        assert len(lines) == 2
+        assert _FakeValidator.received == [
+            ("text/html; charset=utf-8", b"<html></html>")
+        ]
+
+    def test_ignored_messages_dropped(self, fake_port, tmp_path):
+        page = tmp_path / "index.html"
+        page.write_text("<html></html>", encoding="utf-8")
+        lines = validate_page(fake_port, page, ignore=["not allowed as child"])
+        assert lines == [f'"{page}":1.0-1.0: info warning: Consider lang']
+
+    def test_other_server_rejected(self, other_port, tmp_path):
+        page = tmp_path / "index.html"
+        page.write_text("<html></html>", encoding="utf-8")
+        with pytest.raises(OSError):
+            validate_page(other_port, page)
@@ -0,0 +1,126 @@
+"""Tests for mccole.watch."""
+
+from argparse import Namespace
+from pathlib import Path
+
+import mccole.watch as watch_mod
+from mccole.watch import (
+    _changed_files,
+    _needs_full_build,
+    _snapshot,
+    _start_validator,
+    watch,
+)
+
+
+def _config(tmp_path):
+    src = tmp_path / "src"
+    src.mkdir()
+    return {
+        "src": src,
+        "dst": src / "docs",
+        "config": src / "pyproject.toml",
+        "home_page": Path("README.md"),
+        "templates": src / "_templates",
+        "skip_names": {"skipped"},
+    }
+
+
+class TestChangedFiles:
+    def test_no_changes(self):
+        assert _changed_files({Path("a"): 1}, {Path("a"): 1}) == set()
+
+    def test_modified_created_and_deleted(self):
+        before = {Path("a"): 1, Path("b"): 1}
+        after = {Path("a"): 2, Path("c"): 1}
+        assert _changed_files(before, after) == {Path("a"), Path("b"), Path("c")}
+
+
+class TestNeedsFullBuild:
+    def test_chapter_change_is_partial(self, tmp_path):
+        config = _config(tmp_path)
+        changed = {config["src"] / "intro" / "index.md"}
+        assert not _needs_full_build(Namespace(extra=None), config, changed)
+
+    def test_home_page_change_is_full(self, tmp_path):
+        config = _config(tmp_path)
+        changed = {config["src"] / "README.md"}
+        assert _needs_full_build(Namespace(extra=None), config, changed)
+
+    def test_template_change_is_full(self, tmp_path):
+        config = _config(tmp_path)
+        changed = {config["templates"] / "page.html"}
+        assert _needs_full_build(Namespace(extra=None), config, changed)
+
+    def test_template_in_subdirectory_change_is_full(self, tmp_path):
+        config = _config(tmp_path)
+        changed = {config["templates"] / "partials" / "nav.html"}
+        assert _needs_full_build(Namespace(extra=None), config, changed)
+
+    def test_extra_html_change_is_full(self, tmp_path):
+        config = _config(tmp_path)
+        extra = tmp_path / "extra.html"
+        assert _needs_full_build(Namespace(extra=extra), config, {extra})
+
+
+class TestSnapshot:
+    def test_skips_output_hidden_and_skipped_files(self, tmp_path):
+        config = _config(tmp_path)
+        src = config["src"]
+        (src / "README.md").write_text("# Home\n", encoding="utf-8")
+        (src / ".hidden").write_text("", encoding="utf-8")
+        for name in ("docs", "skipped", ".git"):
+            (src / name).mkdir()
+            (src / name / "file.txt").write_text("", encoding="utf-8")
+        assert set(_snapshot(config)) == {src / "README.md"}
+
+
+class TestStartValidator:
+    def test_not_requested(self):
+        assert _start_validator(Namespace(validator=False, validator_port=8888)) is None
+
+    def test_running_validator_reused(self, monkeypatch):
+        def fail_start(port):
+            raise AssertionError("validator should not be started")
+
+        monkeypatch.setattr(watch_mod, "validator_running", lambda port: True)
+        monkeypatch.setattr(watch_mod, "start_validator", fail_start)
+        assert _start_validator(Namespace(validator=True, validator_port=8888)) is None
+
+    def test_started_if_not_running(self, monkeypatch, capsys):
+        monkeypatch.setattr(watch_mod, "validator_running", lambda port: False)
+        monkeypatch.setattr(watch_mod, "start_validator", lambda port: f"proc{port}")
+        options = Namespace(validator=True, validator_port=9999)
+        assert _start_validator(options) == "proc9999"
+        assert "9999" in capsys.readouterr().out
+
+
+class TestWatch:
+    def test_failed_rebuild_retried_with_next_change(self, monkeypatch, capsys):
+        steps = []
+        notified = []
+
+        def fake_step(options, config, env, changed):
+            steps.append(set(changed))
+            if len(steps) == 1:
+                raise ValueError("half-saved file")
+            if len(steps) == 3:
+                raise KeyboardInterrupt()
+            return config, env
+
+        monkeypatch.setattr(watch_mod.time, "sleep", lambda seconds: None)
+        monkeypatch.setattr(watch_mod, "_snapshot", lambda config: next(snapshots))
+        monkeypatch.setattr(watch_mod, "_watch_step", fake_step)
+        snapshots = iter(
+            [
+                {},
+                {Path("a.md"): 1},
+                {Path("a.md"): 1, Path("b.md"): 1},
+                {Path("a.md"): 2, Path("b.md"): 1},
+            ]
+        )
+        options = Namespace(validator=False)
+        watch(options, {"src": Path("src")}, None, notify=lambda: notified.append(1))
+        assert steps == [{Path("a.md")}, {Path("a.md"), Path("b.md")}, {Path("a.md")}]
+        assert notified == [1]
+        assert "rebuild failed: half-saved file" in capsys.readouterr().err